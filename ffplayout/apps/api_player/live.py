@@ -0,0 +1,268 @@
+"""
+server push from statistics, engine status and new log lines,
+one producer thread per process fans out the events to all subscribers
+"""
+
+import asyncio
+import json
+import logging
+import os
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+
+from .utils import SystemControl, SystemStats, read_log_offset, read_yaml
+
+LIVE_PATH = '/api/player/live/'
+
+logger = logging.getLogger(__name__)
+
+
+def parse_channels(value):
+    """
+    return channel ids from comma separated list, None when one is invalid
+    """
+    try:
+        return [str(int(c)) for c in value.split(',') if c.strip()]
+    except ValueError:
+        return None
+
+
+def put_event(events, event):
+    """
+    add event to subscriber queue, drop oldest event from slow clients
+    """
+    while True:
+        try:
+            events.put_nowait(event)
+            return
+        except (Full, asyncio.QueueFull):
+            try:
+                events.get_nowait()
+            except (Empty, asyncio.QueueEmpty):
+                pass
+
+
+class LiveHub:
+    """
+    collect events only while clients are subscribed,
+    and publish them to every subscriber
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.subscribers = {}
+        self.thread = None
+        self.status = {}
+        self.log_offsets = {}
+
+    def subscribe(self, channels, callback):
+        """
+        register callback for events, from the given channels
+        """
+        token = object()
+
+        with self.lock:
+            self.subscribers[token] = ({str(c) for c in channels}, callback)
+
+            if self.thread is None:
+                self.thread = Thread(target=self.loop, daemon=True)
+                self.thread.start()
+
+        return token
+
+    def unsubscribe(self, token):
+        with self.lock:
+            self.subscribers.pop(token, None)
+
+    def publish(self, event, channel=None):
+        with self.lock:
+            subscribers = list(self.subscribers.values())
+
+        for channels, callback in subscribers:
+            if channel is None or channel in channels:
+                callback(event)
+
+    def loop(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    self.status = {}
+                    self.log_offsets = {}
+                    return
+
+                channels = set().union(
+                    *(c for c, _ in self.subscribers.values()))
+
+            try:
+                self.produce(channels)
+            except Exception:
+                # keep producer alive, for the next round
+                logger.exception('Producing live events failed')
+            finally:
+                connection.close()
+
+            sleep(settings.LIVE_INTERVAL)
+
+    def produce(self, channels):
+        self.publish({'event': 'stats', 'data': SystemStats().all()})
+
+        for channel in channels:
+            try:
+                self.produce_channel(channel)
+            except Exception:
+                logger.exception('Live events from channel %s failed',
+                                 channel)
+
+    def produce_channel(self, channel):
+        status = SystemControl().run_service('status', channel)
+
+        if status != self.status.get(channel):
+            self.status[channel] = status
+            self.publish({'event': 'status', 'channel': channel,
+                          'data': status}, channel)
+
+        lines = self.new_log_lines(channel)
+
+        if lines:
+            self.publish({'event': 'log', 'channel': channel,
+                          'data': lines}, channel)
+
+    def new_log_lines(self, channel):
+        """
+        return complete lines, which are added since last call
+        """
+        config = read_yaml(channel)
+
+        if not config or not config.get('logging'):
+            return None
+
+        log_file = os.path.join(config['logging']['log_path'],
+                                f'{settings.LIVE_LOG_TYPE}.log')
+
+        if not os.path.isfile(log_file):
+            return None
+
+        with open(log_file, 'rb') as log:
+            if log_file not in self.log_offsets:
+                # new subscription, send only lines from now on
+                self.log_offsets[log_file] = log.seek(0, os.SEEK_END)
+
+            text, self.log_offsets[log_file] = read_log_offset(
+                log, self.log_offsets[log_file], settings.LOG_CHUNK_SIZE)
+
+        return text.splitlines()
+
+
+LIVE_HUB = LiveHub()
+
+
+def token_user(token):
+    """
+    return user from JWT access token, or None when token is invalid
+    """
+    auth = JWTAuthentication()
+
+    try:
+        return auth.get_user(auth.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def format_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+def event_stream(channels):
+    """
+    generator for server-sent events, in WSGI workers
+    """
+    events = Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+    token = LIVE_HUB.subscribe(channels, lambda e: put_event(events, e))
+
+    try:
+        while True:
+            try:
+                yield format_event(events.get(timeout=15))
+            except Empty:
+                yield ': keepalive\n\n'
+    finally:
+        LIVE_HUB.unsubscribe(token)
+
+
+async def live_application(scope, receive, send):
+    """
+    ASGI application for websocket and server-sent events,
+    authentication goes over token parameter
+    """
+    params = parse_qs(scope.get('query_string', b'').decode())
+    channels = parse_channels(params.get('channels', [''])[0])
+    user = await sync_to_async(token_user)(params.get('token', [''])[0])
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+
+    if scope['type'] == 'websocket':
+        await receive()
+
+        if not user or channels is None:
+            await send({'type': 'websocket.close',
+                        'code': 4401 if not user else 4400})
+            return
+
+        await send({'type': 'websocket.accept'})
+        disconnect = 'websocket.disconnect'
+    else:
+        if not user or channels is None:
+            await send({'type': 'http.response.start',
+                        'status': 401 if not user else 400,
+                        'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache')]})
+        disconnect = 'http.disconnect'
+
+    async def wait_disconnect():
+        while (await receive())['type'] != disconnect:
+            pass
+
+    closed = asyncio.ensure_future(wait_disconnect())
+    token = LIVE_HUB.subscribe(channels, lambda e: loop.call_soon_threadsafe(
+        put_event, events, e))
+
+    try:
+        while not closed.done():
+            next_event = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait(
+                {next_event, closed}, timeout=15,
+                return_when=asyncio.FIRST_COMPLETED)
+
+            if next_event not in done:
+                next_event.cancel()
+
+                if not done and scope['type'] != 'websocket':
+                    await send({'type': 'http.response.body',
+                                'body': b': keepalive\n\n',
+                                'more_body': True})
+            elif scope['type'] == 'websocket':
+                await send({'type': 'websocket.send',
+                            'text': json.dumps(next_event.result())})
+            else:
+                await send({'type': 'http.response.body',
+                            'body': format_event(
+                                next_event.result()).encode(),
+                            'more_body': True})
+    finally:
+        LIVE_HUB.unsubscribe(token)
+        closed.cancel()
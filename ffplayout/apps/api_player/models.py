@@ -1,5 +1,8 @@
+import uuid
+
 import psutil
 from django.db import models
+from django.utils import timezone
 
 
 class GuiSettings(models.Model):
@@ -71,3 +74,90 @@ class MessengePresets(models.Model):
 
     def __str__(self):
         return str(self.name)
+
+
+class MediaCache(models.Model):
+    """
+    cached media information from clips,
+    entries are only valid as long as size and modification time matches
+    """
+    path = models.CharField(max_length=4096, unique=True)
+    size = models.BigIntegerField(default=0)
+    mtime_ns = models.BigIntegerField(default=0)
+    duration = models.FloatField(default=0)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "mediacache"
+
+    def __str__(self):
+        return str(self.path)
+
+
+class MediaIndex(models.Model):
+    """
+    index from all files in the media storage,
+    duration is only set for files with playout extensions
+    """
+    root = models.CharField(max_length=4096, db_index=True)
+    folder = models.CharField(max_length=4096, db_index=True)
+    name = models.CharField(max_length=1024)
+    path = models.CharField(max_length=4096, unique=True)
+    extension = models.CharField(max_length=32, db_index=True)
+    size = models.BigIntegerField(default=0)
+    mtime_ns = models.BigIntegerField(default=0)
+    duration = models.FloatField(blank=True, null=True, default=None)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "mediaindex"
+
+    def __str__(self):
+        return str(self.path)
+
+
+class Upload(models.Model):
+    """
+    resumable upload, data goes to a part file next to the target,
+    offset is the number of stored bytes
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    channel = models.IntegerField()
+    path = models.CharField(max_length=4096)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, default='')
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "uploads"
+
+    def __str__(self):
+        return str(self.path)
+
+
+class Job(models.Model):
+    """
+    background job, which runs in a worker thread from any process,
+    params and result are stored as json
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    kind = models.CharField(max_length=32)
+    channel = models.IntegerField(blank=True, null=True)
+    params = models.TextField(default='{}')
+    status = models.CharField(max_length=16, default='queued',
+                              db_index=True)
+    done = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    cancel = models.BooleanField(default=False)
+    result = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "jobs"
+
+    def __str__(self):
+        return f'{self.kind} {self.id}'
@@ -1,8 +1,9 @@
 import configparser
+import json
 import os
 from shutil import copyfile
 
-from apps.api_player.models import GuiSettings, MessengePresets
+from apps.api_player.models import GuiSettings, Job, MessengePresets
 from apps.api_player.utils import read_yaml, write_yaml
 from django.contrib.auth.models import User
 from rest_framework import serializers
@@ -142,3 +143,18 @@ class MessengerSerializer(serializers.ModelSerializer):
     class Meta:
         model = MessengePresets
         fields = '__all__'
+
+
+class JobSerializer(serializers.ModelSerializer):
+    params = serializers.SerializerMethodField()
+    result = serializers.SerializerMethodField()
+
+    def get_params(self, obj):
+        return json.loads(obj.params)
+
+    def get_result(self, obj):
+        return json.loads(obj.result) if obj.result else None
+
+    class Meta:
+        model = Job
+        fields = '__all__'
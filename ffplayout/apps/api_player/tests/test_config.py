@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings
+from ..utils import YamlLoader, read_yaml
+from .test_media import create_config
+
+
+class ConfigCacheTests(APITestCase):
+    """
+    test cached reading from playout config
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_config_cache(self):
+        """
+        config is only parsed again after it was changed
+        """
+        with patch('apps.api_player.utils.yaml.load',
+                   side_effect=lambda f, Loader: YamlLoader(f).get_data()
+                   ) as load:
+            read_yaml(self.config.id)
+            config = read_yaml(self.config.id)
+            self.assertEqual(load.call_count, 1)
+
+            config['storage']['path'] = '/tmp/other'
+            response = self.client.post(
+                '/api/player/config/',
+                {'data': config, 'channel': self.config.id}, format='json')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                read_yaml(self.config.id)['storage']['path'], '/tmp/other')
+            self.assertEqual(load.call_count, 2)
+
+    def test_gui_settings_change(self):
+        """
+        changing the gui settings invalidates the cached config
+        """
+        read_yaml(self.config.id)
+        self.config.playout_config = os.path.join(self.tmp_dir, 'none.yml')
+        self.config.save()
+
+        self.assertIsNone(read_yaml(self.config.id))
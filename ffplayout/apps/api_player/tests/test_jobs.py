@@ -0,0 +1,266 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from time import sleep
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings, Job, MediaCache, MediaIndex
+from ..utils import JobWorker
+from .test_media import create_config
+
+INFO = {'duration': 10.0, 'format': 'MPEG-4',
+        'video': {'codec': 'AVC', 'width': 1024, 'height': 576,
+                  'frame_rate': '25.000'}, 'audio': None}
+
+
+@patch('apps.api_player.utils.MediaIndexer.run')
+@patch('apps.api_player.utils.media_info', return_value=INFO)
+class MediaJobTests(APITestCase):
+    """
+    test probing and indexing files after upload and file operations
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.media = os.path.join(self.tmp_dir, 'media')
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def upload(self):
+        location = self.client.post('/api/player/media/upload/', {
+            'channel': self.config.id, 'path': '/media',
+            'filename': 'clip.mp4', 'size': 16}, format='json')['Location']
+
+        return self.client.patch(
+            location, b'\0' * 16,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET='0').json()['job']
+
+    def test_upload(self, media_info, indexer):
+        job = self.upload()
+
+        self.assertEqual(self.client.get(
+            f'/api/player/jobs/{job}/').json()['status'], 'queued')
+
+        while JobWorker.run_next():
+            pass
+
+        response = self.client.get(f'/api/player/jobs/{job}/').json()
+        path = os.path.join(self.media, 'clip.mp4')
+
+        self.assertEqual(response['status'], 'done')
+        self.assertEqual(response['result']['files'][path], INFO)
+        self.assertEqual(MediaCache.objects.get(path=path).duration, 10.0)
+        self.assertEqual(MediaIndex.objects.get(path=path).duration, 10.0)
+
+    @override_settings(MEDIA_INDEX=False)
+    def test_rename_delete(self, media_info, indexer):
+        self.upload()
+        JobWorker.run_next()
+
+        self.client.patch('/api/player/media/op/', {
+            'channel': self.config.id, 'path': '/media/',
+            'oldname': 'clip.mp4', 'newname': 'new.mp4'}, format='json')
+        JobWorker.run_next()
+
+        self.assertEqual(media_info.call_count, 1)
+        self.assertEqual(list(MediaCache.objects.values_list('path')),
+                         [(os.path.join(self.media, 'new.mp4'),)])
+
+        self.client.delete(
+            f'/api/player/media/op/?channel={self.config.id}'
+            '&path=/media/&file=new.mp4')
+        JobWorker.run_next()
+
+        self.assertFalse(MediaCache.objects.exists())
+
+
+@override_settings(MEDIA_INDEX=False)
+class FileJobTests(APITestCase):
+    """
+    test file operations in background jobs
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.media = os.path.join(self.tmp_dir, 'media')
+
+        for folder in ['folder/sub', 'target']:
+            os.makedirs(os.path.join(self.media, folder))
+
+        for clip in ['clip.mp4', 'folder/clip.mp4', 'folder/sub/clip.mp4']:
+            with open(os.path.join(self.media, clip), 'wb') as outfile:
+                outfile.write(b'\0' * 16)
+
+        MediaCache.objects.create(
+            path=os.path.join(self.media, 'folder/clip.mp4'), duration=5.0)
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def run_job(self, **data):
+        response = self.client.post(
+            '/api/player/jobs/', dict(data, channel=self.config.id),
+            format='json')
+        self.assertEqual(response.status_code, 202)
+
+        while JobWorker.run_next():
+            pass
+
+        return self.client.get(
+            f'/api/player/jobs/{response.json()["id"]}/').json()
+
+    def test_delete(self):
+        job = self.run_job(kind='delete', paths=['/media/folder',
+                                                 '/media/../'])
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['done'], job['total']), (4, 4))
+        self.assertEqual(list(job['result']['errors']), ['/media/../'])
+        self.assertEqual(sorted(os.listdir(self.media)),
+                         ['clip.mp4', 'target'])
+        self.assertFalse(MediaCache.objects.exists())
+
+    def test_delete_root(self):
+        """
+        storage root is refused, also after other folders
+        """
+        job = self.run_job(kind='delete', paths=['/media/folder', '/media',
+                                                 '/media/'])
+
+        self.assertEqual(list(job['result']['errors']),
+                         ['/media', '/media/'])
+        self.assertEqual(sorted(os.listdir(self.media)),
+                         ['clip.mp4', 'target'])
+
+    def test_move_copy(self):
+        job = self.run_job(kind='copy', paths=['/media/folder'],
+                           target='/media/target')
+
+        self.assertEqual(job['result']['errors'], {})
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.media, 'target/folder/sub/clip.mp4')))
+        self.assertEqual(MediaCache.objects.get(path=os.path.join(
+            self.media, 'target/folder/clip.mp4')).duration, 5.0)
+
+        job = self.run_job(kind='move', paths=['/media/clip.mp4',
+                                               '/media/folder'],
+                           target='/media/target')
+
+        self.assertEqual(list(job['result']['errors']), ['/media/folder'])
+        self.assertEqual(sorted(os.listdir(self.media)),
+                         ['folder', 'target'])
+
+        job = self.run_job(kind='rename', renames=[
+            ['/media/target/clip.mp4', 'new.mp4']])
+
+        self.assertEqual(sorted(os.listdir(
+            os.path.join(self.media, 'target'))), ['folder', 'new.mp4'])
+
+    def test_stale(self):
+        """
+        running job from a stopped worker is failed
+        """
+        job = Job.objects.create(kind='delete', channel=self.config.id,
+                                 status='running')
+        Job.objects.filter(id=job.id).update(
+            updated=timezone.now() - timedelta(minutes=5))
+
+        self.assertFalse(JobWorker.run_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    @override_settings(JOB_HEARTBEAT=0.05)
+    def test_heartbeat(self):
+        """
+        heartbeat is written while waiting for blocking file operations
+        """
+        job = Job.objects.create(kind='delete', channel=self.config.id,
+                                 status='running')
+        Job.objects.filter(id=job.id).update(
+            updated=timezone.now() - timedelta(minutes=5))
+
+        JobWorker.call(job, sleep, 0.2)
+
+        job.refresh_from_db()
+        self.assertGreater(job.updated,
+                           timezone.now() - timedelta(seconds=10))
+
+    def test_cancel(self):
+        response = self.client.post(
+            '/api/player/jobs/', {'channel': self.config.id,
+                                  'kind': 'delete',
+                                  'paths': ['/media/folder']}, format='json')
+        job = self.client.post(
+            f'/api/player/jobs/{response.json()["id"]}/cancel/').json()
+
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertFalse(JobWorker.run_next())
+        self.assertTrue(os.path.isdir(os.path.join(self.media, 'folder')))
+
+    def test_batch(self):
+        response = self.client.post('/api/player/media/op/batch/', {
+            'channel': self.config.id, 'operations': [
+                {'op': 'mkdir', 'path': '/media', 'name': 'new'},
+                {'op': 'rename', 'path': '/media/clip.mp4',
+                 'name': 'renamed.mp4'},
+                {'op': 'move', 'path': '/media/renamed.mp4',
+                 'target': '/media/new'},
+                {'op': 'delete', 'path': '/media/folder/clip.mp4'},
+                {'op': 'delete', 'path': '/media/folder'},
+                {'op': 'delete', 'path': '/media/missing.mp4'},
+                {'op': 'delete', 'path': '/media/../../'}]}, format='json')
+        results = response.json()['results']
+
+        self.assertEqual([r['status'] for r in results],
+                         ['done', 'done', 'done', 'done', 'queued',
+                          'error', 'error'])
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.media, 'new/renamed.mp4')))
+
+        while JobWorker.run_next():
+            pass
+
+        self.assertFalse(MediaCache.objects.exists())
+
+        self.assertEqual(self.client.get(
+            f'/api/player/jobs/{results[4]["job"]}/').json()['status'],
+            'done')
+        self.assertEqual(sorted(os.listdir(self.media)), ['new', 'target'])
+
+    def test_delete_symlink(self):
+        target = os.path.join(self.media, 'clip.mp4')
+        os.symlink(target, os.path.join(self.media, 'link.mp4'))
+        os.symlink(os.path.join(self.media, 'folder'),
+                   os.path.join(self.media, 'dir'))
+
+        response = self.client.post('/api/player/media/op/batch/', {
+            'channel': self.config.id, 'operations': [
+                {'op': 'delete', 'path': '/media/link.mp4'},
+                {'op': 'delete', 'path': '/media/dir'}]}, format='json')
+
+        self.assertEqual([r['status'] for r in response.json()['results']],
+                         ['done', 'done'])
+        self.assertFalse(os.path.lexists(os.path.join(self.media, 'link.mp4')))
+        self.assertFalse(os.path.lexists(os.path.join(self.media, 'dir')))
+        self.assertTrue(os.path.isfile(target))
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.media, 'folder/sub/clip.mp4')))
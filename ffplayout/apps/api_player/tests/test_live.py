@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ..live import LiveHub, live_application
+from ..models import GuiSettings
+from ..utils import StatsSampler
+from .test_media import create_config
+
+
+class LiveEventsTests(APITestCase):
+    """
+    test live events from statistics, engine status and logs
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.log_file = os.path.join(self.tmp_dir, 'log', 'ffplayout.log')
+        StatsSampler.sampler = None
+        history_dir = self.settings(STATS_HISTORY_DIR=self.tmp_dir)
+        history_dir.enable()
+        self.addCleanup(history_dir.disable)
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_log(self, text):
+        with open(self.log_file, 'a') as log:
+            log.write(text)
+
+    @patch('apps.api_player.live.SystemControl')
+    def test_produce(self, control):
+        """
+        events are only published for subscribed channels,
+        status only when it changes
+        """
+        control.return_value.run_service.return_value = {'data': 'RUNNING'}
+        channel = str(self.config.id)
+        events = []
+        other = []
+        hub = LiveHub()
+        hub.subscribers[object()] = ({channel}, events.append)
+        hub.subscribers[object()] = ({'99'}, other.append)
+
+        self.write_log('old line\n')
+        hub.produce({channel})
+        self.write_log('[INFO] first\n[INFO] second\n[INFO] thi')
+        hub.produce({channel})
+        self.write_log('rd\n')
+        hub.produce({channel})
+
+        self.assertEqual(
+            [e['event'] for e in events],
+            ['stats', 'status', 'stats', 'log', 'stats', 'log'])
+        self.assertEqual(events[3]['data'], ['[INFO] first',
+                                             '[INFO] second'])
+        self.assertEqual(events[5]['data'], ['[INFO] third'])
+        self.assertEqual([e['event'] for e in other], ['stats'] * 3)
+
+    @patch('apps.api_player.live.SystemControl')
+    def test_produce_error(self, control):
+        """
+        failing channel does not stop events from other channels
+        """
+        control.return_value.run_service.side_effect = [
+            ValueError('broken'), {'data': 'RUNNING'}]
+        events = []
+        hub = LiveHub()
+        hub.subscribers[object()] = ({'1', '2'}, events.append)
+
+        with self.assertLogs('apps.api_player.live', 'ERROR'):
+            hub.produce(['1', '2'])
+
+        self.assertEqual([e['event'] for e in events], ['stats', 'status'])
+
+    def test_invalid_channels(self):
+        response = self.client.get(
+            '/api/player/live/',
+            {'token': str(AccessToken.for_user(self.user)),
+             'channels': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_event_stream_auth(self):
+        """
+        event stream accepts the token as parameter
+        """
+        response = self.client.get('/api/player/live/')
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(
+            '/api/player/live/',
+            {'token': str(AccessToken.for_user(self.user)), 'channels': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        response.close()
+
+    def test_asgi_invalid_token(self):
+        """
+        asgi application rejects invalid tokens
+        """
+        messages = []
+
+        async def receive():
+            return {'type': 'websocket.connect'}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(live_application)(
+            {'type': 'websocket', 'path': '/api/player/live/',
+             'query_string': b'token=invalid'}, receive, send)
+
+        self.assertEqual(messages, [{'type': 'websocket.close',
+                                     'code': 4401}])
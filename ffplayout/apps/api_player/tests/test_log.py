@@ -0,0 +1,227 @@
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import zstandard
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings
+from ..utils import LogIndex
+from .test_media import create_config
+
+
+class LogReaderTests(APITestCase):
+    """
+    test reading engine logs
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.log_path = os.path.join(self.tmp_dir, 'log')
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_log(self, text, name='ffplayout.log'):
+        with open(os.path.join(self.log_path, name), 'a') as log:
+            log.write(text)
+
+    def get_log(self, encoding='', **params):
+        return self.client.get(
+            '/api/player/log/', {'type': 'ffplayout', 'date': self.today,
+                                 'channel': self.config.id, **params},
+            HTTP_ACCEPT_ENCODING=encoding)
+
+    def test_full_log(self):
+        self.write_log('line 1\nline 2\n')
+        response = self.get_log()
+
+        self.assertEqual(response.json(), {'log': 'line 1\nline 2',
+                                           'offset': 14})
+
+    def test_offset(self):
+        """
+        only new and complete lines are returned
+        """
+        self.write_log('line 1\nline 2\nline')
+        response = self.get_log(offset=7)
+
+        self.assertEqual(response.json(), {'log': 'line 2\n', 'offset': 14})
+
+        self.write_log(' 3\n')
+        response = self.get_log(offset=14)
+
+        self.assertEqual(response.json(), {'log': 'line 3\n', 'offset': 21})
+
+        response = self.get_log(offset=21)
+        self.assertEqual(response.json(), {'log': '', 'offset': 21})
+
+        response = self.get_log(offset=100)
+        self.assertEqual(response.json()['offset'], 21)
+
+    def test_tail(self):
+        self.write_log(''.join(f'line {i}\n' for i in range(20000)))
+        response = self.get_log(tail=3)
+
+        self.assertEqual(response.json()['log'],
+                         'line 19997\nline 19998\nline 19999')
+        self.assertEqual(
+            response.json()['offset'],
+            os.path.getsize(os.path.join(self.log_path, 'ffplayout.log')))
+
+    def test_compressed_logs(self):
+        """
+        rotated logs can be compressed
+        """
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        before = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        oldest = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
+        text = ''.join(f'line {i}\n' for i in range(1000))
+
+        with gzip.open(os.path.join(
+                self.log_path, f'ffplayout.log.{yesterday}.gz'), 'wt') as log:
+            log.write(text)
+
+        with lzma.open(os.path.join(
+                self.log_path, f'ffplayout.log.{before}.xz'), 'wt') as log:
+            log.write(text)
+
+        with open(os.path.join(
+                self.log_path, f'ffplayout.log.{oldest}.zst'), 'wb') as log:
+            log.write(zstandard.ZstdCompressor().compress(text.encode()))
+
+        for date_ in [yesterday, before, oldest]:
+            response = self.get_log(date=date_)
+            self.assertEqual(response.json()['log'], text.strip())
+
+            response = self.get_log(date=date_, tail=2)
+            self.assertEqual(response.json()['log'], 'line 998\nline 999')
+
+            response = self.get_log(date=date_, offset=len(text) - 18)
+            self.assertEqual(response.json(), {'log': 'line 998\nline 999\n',
+                                               'offset': len(text)})
+
+    def test_response_compression(self):
+        self.write_log(''.join(f'line {i}\n' for i in range(1000)))
+        response = self.get_log(encoding='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_missing_log(self):
+        response = self.get_log(tail=3)
+        self.assertEqual(response.status_code, 204)
+
+
+class LogQueryTests(APITestCase):
+    """
+    test searching log records
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.log_path = os.path.join(self.tmp_dir, 'log')
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        self.yesterday = (datetime.now() - timedelta(days=1)).strftime(
+            '%Y-%m-%d')
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+        with open(os.path.join(
+                self.log_path, f'ffplayout.log.{self.yesterday}'), 'w') as log:
+            log.write(f'[{self.yesterday} 23:59:00] [INFO]    Play: a.mp4\n'
+                      f'[{self.yesterday} 23:59:30] [ERROR]   File not '
+                      'found: b.mp4\n')
+
+        self.write_log(f'[{self.today} 00:00:10] [INFO]    Play: c.mp4\n'
+                       f'[{self.today} 00:01:00] [\x1b[33mWARNING\x1b[0m] '
+                       'Clip is to short\n    second line from warning\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_log(self, text):
+        with open(os.path.join(self.log_path, 'ffplayout.log'), 'a') as log:
+            log.write(text)
+
+    def query(self, **params):
+        return self.client.get(
+            '/api/player/log/query/',
+            {'type': 'ffplayout', 'channel': self.config.id,
+             'from': self.yesterday, 'to': self.today, **params}
+        ).json()['records']
+
+    def test_query(self):
+        self.assertEqual(len(self.query()), 4)
+        self.assertEqual(self.query(level='error,warning'), [
+            {'time': f'{self.yesterday} 23:59:30', 'level': 'ERROR',
+             'message': 'File not found: b.mp4'},
+            {'time': f'{self.today} 00:01:00', 'level': 'WARNING',
+             'message': 'Clip is to short\n    second line from warning'}
+        ])
+        self.assertEqual(
+            [r['message'] for r in self.query(search='PLAY')],
+            ['Play: a.mp4', 'Play: c.mp4'])
+        self.assertEqual(
+            [r['time'] for r in self.query(
+                start=f'{self.yesterday}T23:59:30',
+                end=f'{self.today}T00:00:10')],
+            [f'{self.yesterday} 23:59:30', f'{self.today} 00:00:10'])
+        self.assertEqual(len(self.query(limit=1)), 1)
+
+    def test_query_compressed(self):
+        rotated = os.path.join(self.log_path,
+                               f'ffplayout.log.{self.yesterday}')
+
+        with open(rotated, 'rb') as log:
+            with gzip.open(os.path.join(
+                    self.log_path, f'ffplayout.log.{self.yesterday}.gz'),
+                    'wb') as compressed:
+                compressed.write(log.read())
+
+        os.remove(rotated)
+
+        self.assertEqual(
+            [r['message'] for r in self.query(level='error')],
+            ['File not found: b.mp4'])
+
+    def test_query_zstd(self):
+        rotated = os.path.join(self.log_path,
+                               f'ffplayout.log.{self.yesterday}')
+
+        with open(rotated, 'rb') as log:
+            with open(f'{rotated}.zst', 'wb') as compressed:
+                compressed.write(
+                    zstandard.ZstdCompressor().compress(log.read()))
+
+        os.remove(rotated)
+
+        self.assertEqual(
+            [r['message'] for r in self.query(level='info,error')],
+            ['Play: a.mp4', 'File not found: b.mp4', 'Play: c.mp4'])
+
+    def test_incremental_index(self):
+        """
+        index is only extended, when log grows
+        """
+        self.query()
+        index = LogIndex.get(os.path.join(self.log_path, 'ffplayout.log'))
+        end = index.end
+
+        self.write_log(f'[{self.today} 00:02:00] [INFO]    Play: d.mp4\n')
+        records = self.query(**{'from': self.today})
+
+        self.assertEqual(records[-1]['message'], 'Play: d.mp4')
+        self.assertEqual(index.offsets[-1], end)
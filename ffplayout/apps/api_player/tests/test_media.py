@@ -0,0 +1,340 @@
+import json
+import os
+import shutil
+import tempfile
+from time import monotonic
+from unittest.mock import patch
+
+import yaml
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings, MediaCache, MediaIndex
+from ..utils import MediaIndexer
+
+
+def create_config(tmp_dir, bind_address='127.0.0.1:5555'):
+    """
+    create a minimal playout config, with media folder
+    """
+    config = {
+        'logging': {'log_path': os.path.join(tmp_dir, 'log')},
+        'playlist': {'path': os.path.join(tmp_dir, 'playlists'),
+                     'day_start': '00:00:00', 'length': '24:00:00'},
+        'storage': {'path': os.path.join(tmp_dir, 'media'),
+                    'extensions': ['.mp4', '.mkv']},
+        'text': {'bind_address': bind_address}
+    }
+
+    for folder in ['log', 'playlists', 'media']:
+        os.makedirs(os.path.join(tmp_dir, folder), exist_ok=True)
+
+    config_path = os.path.join(tmp_dir, 'ffplayout.yml')
+
+    with open(config_path, 'w') as config_file:
+        yaml.dump(config, config_file)
+
+    return config_path
+
+
+@override_settings(MEDIA_INDEX=False)
+class MediaCacheTests(APITestCase):
+    """
+    test media listing with cached durations
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.media = os.path.join(self.tmp_dir, 'media')
+
+        for i in range(3):
+            with open(os.path.join(self.media, f'clip{i}.mp4'), 'wb') as clip:
+                clip.write(b'\0' * 16)
+
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def get_media(self):
+        return self.client.get(
+            '/api/player/media/',
+            {'extensions': '.mp4', 'channel': self.config.id, 'path': ''})
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_duration_cache(self, probe):
+        """
+        clips are only parsed again, when they change
+        """
+        response = self.get_media()
+
+        self.assertEqual(probe.call_count, 3)
+        self.assertEqual(MediaCache.objects.count(), 3)
+        self.assertEqual(
+            [f['duration'] for f in response.json()['tree'][2]], [10.0] * 3)
+
+        self.get_media()
+        self.assertEqual(probe.call_count, 3)
+
+        clip = os.path.join(self.media, 'clip1.mp4')
+        stat = os.stat(clip)
+        os.utime(clip, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.get_media()
+        self.assertEqual(probe.call_count, 4)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_cache_eviction(self, probe):
+        """
+        cache never grows over his limit
+        """
+        with self.settings(MEDIA_CACHE_SIZE=2):
+            self.get_media()
+
+        self.assertEqual(MediaCache.objects.count(), 2)
+
+    def test_hanging_clip(self):
+        """
+        a hanging clip is killed, skipped and not cached
+        """
+        bin_path = os.path.join(self.tmp_dir, 'bin')
+        os.mkdir(bin_path)
+
+        with open(os.path.join(bin_path, 'mediainfo'), 'w') as mediainfo:
+            mediainfo.write('#!/bin/sh\n'
+                            'case "$2" in *clip1.mp4) sleep 30;; esac\n'
+                            'echo 10000\n')
+
+        os.chmod(os.path.join(bin_path, 'mediainfo'), 0o755)
+        start = monotonic()
+
+        with self.settings(MEDIA_PROBE_TIMEOUT=0.5), patch.dict(
+                os.environ, PATH=f'{bin_path}:{os.environ["PATH"]}'):
+            response = self.get_media()
+
+        self.assertLess(monotonic() - start, 10)
+
+        self.assertEqual(
+            [f['file'] for f in response.json()['tree'][2]],
+            ['clip0.mp4', 'clip1.mp4', 'clip2.mp4'])
+        self.assertEqual(
+            [f['duration'] for f in response.json()['tree'][2]],
+            [10.0, 0, 10.0])
+        self.assertEqual(MediaCache.objects.count(), 2)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_pagination(self, probe):
+        """
+        only clips from the requested page are parsed
+        """
+        response = self.client.get(
+            '/api/player/media/',
+            {'extensions': '.mp4', 'channel': self.config.id, 'path': '',
+             'offset': 1, 'limit': 1})
+
+        self.assertEqual(response.json()['tree'][2],
+                         [{'file': 'clip1.mp4', 'duration': 10.0}])
+        self.assertEqual(response.json()['total'], 3)
+        self.assertEqual(response.json()['next'], 2)
+        self.assertEqual(probe.call_count, 1)
+
+        response = self.client.get(
+            '/api/player/media/',
+            {'extensions': '.mp4', 'channel': self.config.id, 'path': '',
+             'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_stream(self, probe):
+        """
+        stream folder as ndjson
+        """
+        response = self.client.get(
+            '/api/player/media/',
+            {'extensions': '.mp4', 'channel': self.config.id, 'path': '',
+             'stream': 1})
+        lines = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(lines[0]['total'], 3)
+        self.assertEqual([line['file'] for line in lines[1:]],
+                         ['clip0.mp4', 'clip1.mp4', 'clip2.mp4'])
+
+
+@override_settings(MEDIA_INDEX=False)
+class MediaIndexTests(APITestCase):
+    """
+    test indexing from media storage
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.media = os.path.join(self.tmp_dir, 'media')
+        os.makedirs(os.path.join(self.media, 'folder'))
+
+        for clip in ['clip0.mp4', 'cover.jpg', 'folder/clip1.mkv']:
+            with open(os.path.join(self.media, clip), 'wb') as clip_file:
+                clip_file.write(b'\0' * 16)
+
+        self.indexer = MediaIndexer(self.media, ['.mp4', '.mkv'])
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_scan(self, probe):
+        """
+        rescan updates only changed files
+        """
+        self.indexer.scan()
+
+        self.assertEqual(probe.call_count, 2)
+        self.assertEqual(MediaIndex.objects.count(), 3)
+        self.assertEqual(
+            MediaIndex.objects.get(name='clip1.mkv').folder,
+            os.path.join(self.media, 'folder'))
+        self.assertIsNone(MediaIndex.objects.get(name='cover.jpg').duration)
+
+        os.remove(os.path.join(self.media, 'cover.jpg'))
+
+        with open(os.path.join(self.media, 'clip2.mp4'), 'wb') as clip:
+            clip.write(b'\0' * 16)
+
+        self.indexer.scan()
+
+        self.assertEqual(probe.call_count, 3)
+        self.assertEqual(
+            sorted(MediaIndex.objects.values_list('name', flat=True)),
+            ['clip0.mp4', 'clip1.mkv', 'clip2.mp4'])
+
+    @patch('apps.api_player.utils.MediaIndexer.run')
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_listing_from_index(self, probe, _):
+        """
+        media listing takes durations from index
+        """
+        self.indexer.scan()
+        MediaCache.objects.all().delete()
+
+        with self.settings(MEDIA_INDEX=True):
+            response = self.client.get(
+                '/api/player/media/',
+                {'extensions': '.mp4', 'channel': self.config.id,
+                 'path': ''})
+
+        self.assertEqual(response.json()['tree'][2],
+                         [{'file': 'clip0.mp4', 'duration': 10.0}])
+        self.assertEqual(probe.call_count, 2)
+
+    @patch('apps.api_player.utils.MediaIndexer.run')
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_search(self, *_):
+        """
+        search by substring, prefix and extension
+        """
+        self.indexer.scan()
+
+        def search(**params):
+            response = self.client.get(
+                '/api/player/media/search/',
+                {'channel': self.config.id, **params})
+            return [r['file'] for r in response.json()['results']]
+
+        self.assertEqual(search(q='lip'), ['clip0.mp4', 'clip1.mkv'])
+        self.assertEqual(search(q='CLIP1'), ['clip1.mkv'])
+        self.assertEqual(search(q='co', mode='prefix'), ['cover.jpg'])
+        self.assertEqual(search(q='li', mode='prefix'), [])
+        self.assertEqual(search(q='', extensions='.mkv'), ['clip1.mkv'])
+
+        with open(os.path.join(self.media, 'clip3.mp4'), 'wb') as clip:
+            clip.write(b'\0' * 16)
+
+        self.indexer.scan()
+
+        self.assertEqual(search(q='clip', mode='prefix', extensions='.mp4'),
+                         ['clip0.mp4', 'clip3.mp4'])
+
+        with open(os.path.join(self.media, 'clip2.mp4'), 'wb') as clip:
+            clip.write(b'\0' * 16)
+
+        self.indexer.scan()
+
+        # first matches in natural path order, not in index order
+        self.assertEqual(search(q='clip', limit=3),
+                         ['clip0.mp4', 'clip2.mp4', 'clip3.mp4'])
+
+
+class MediaStreamTests(APITestCase):
+    """
+    test serving media files with range requests
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.data = os.urandom(10000)
+
+        with open(os.path.join(self.tmp_dir, 'media', 'clip.mp4'),
+                  'wb') as clip:
+            clip.write(self.data)
+
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def stream(self, path='/media/clip.mp4', **headers):
+        return self.client.get('/api/player/media/stream/',
+                               {'channel': self.config.id, 'path': path},
+                               **headers)
+
+    def test_full(self):
+        response = self.stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '10000')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_range(self):
+        response = self.stream(HTTP_RANGE='bytes=100-199')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/10000')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.data[100:200])
+
+        response = self.stream(HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.data[-10:])
+
+        response = self.stream(HTTP_RANGE='bytes=9990-',
+                               HTTP_IF_RANGE=response['ETag'])
+        self.assertEqual(response.status_code, 206)
+
+        response = self.stream(HTTP_RANGE='bytes=9990-',
+                               HTTP_IF_RANGE='"changed"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.stream(HTTP_RANGE='bytes=20000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10000')
+
+    def test_outside_storage(self):
+        self.assertEqual(self.stream('/media/../ffplayout.yml').status_code,
+                         404)
+        self.assertEqual(self.stream('/etc/passwd').status_code, 404)
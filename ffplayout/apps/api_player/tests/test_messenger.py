@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 from threading import Thread
 
 import zmq
@@ -6,6 +9,8 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from ..models import GuiSettings, MessengePresets
+from ..utils import ZMQ_POOL
+from .test_media import create_config
 
 
 class MessagePresetTests(APITestCase):
@@ -144,3 +149,96 @@ class SendMessageTests(APITestCase):
                                     format='json')
 
         self.assertEqual(response.json()['status'], {'Success': '0 Success'})
+
+
+def zmq_pool_server(address, count):
+    context = zmq.Context()
+    socket = context.socket(zmq.REP)
+    socket.bind(address)
+
+    for _ in range(count):
+        socket.recv()
+        socket.send(b'0 Success')
+
+    socket.close()
+    context.term()
+
+
+class SendMessagePoolTests(APITestCase):
+    """
+    test message sending over pooled connections
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir, '127.0.0.1:5556'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_connection_reuse(self):
+        """
+        all messages are send over the same connection
+        """
+        server = Thread(target=zmq_pool_server,
+                        args=('tcp://127.0.0.1:5556', 3))
+        server.start()
+
+        for _ in range(3):
+            response = self.client.post(
+                '/api/player/send/message/',
+                {'data': {'text': 'hello'}, 'channel': self.config.id},
+                format='json')
+
+            self.assertEqual(response.json()['status'],
+                             {'Success': '0 Success'})
+
+        server.join()
+        self.assertEqual(
+            len(ZMQ_POOL.sockets['tcp://localhost:5556']), 1)
+
+    def test_no_response(self):
+        """
+        broken connection is not reused after timeout
+        """
+        with self.settings(REQUEST_TIMEOUT=100):
+            response = self.client.post(
+                '/api/player/send/message/',
+                {'data': {'text': 'hello'}, 'channel': self.config.id},
+                format='json')
+
+        self.assertEqual(response.json()['status'],
+                         {'Success': 'No response from server'})
+
+    def test_batch_send(self):
+        """
+        send preset to multiple channels
+        """
+        server = Thread(target=zmq_pool_server,
+                        args=('tcp://127.0.0.1:5556', 1))
+        server.start()
+        preset = MessengePresets.objects.create(name='Preset1',
+                                                message='hello')
+        second = GuiSettings.objects.create(
+            playout_config=create_config(
+                os.path.join(self.tmp_dir, 'second'), '127.0.0.1:5557'))
+
+        with self.settings(REQUEST_TIMEOUT=500):
+            response = self.client.post(
+                '/api/player/send/message/batch/',
+                {'preset': preset.id, 'channels': [self.config.id,
+                                                   second.id, 99]},
+                format='json')
+
+        server.join()
+        self.assertEqual(response.json()['status'], {
+            str(self.config.id): {'Success': '0 Success'},
+            str(second.id): {'Success': 'No response from server'},
+            '99': {'Failed': 'No config exists'}
+        })
@@ -0,0 +1,372 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings
+from .test_media import create_config
+
+
+def create_playlist(date_, sources, duration=10.0):
+    return {
+        'channel': 'Channel 1',
+        'date': date_,
+        'program': [{'in': 0, 'out': duration, 'duration': duration,
+                     'source': source} for source in sources]
+    }
+
+
+class PlaylistTests(APITestCase):
+    """
+    test reading and writing playlists
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.playlist = create_playlist('2021-03-01', ['/a.mp4', '/b.mp4'])
+        self.path = os.path.join(self.tmp_dir, 'playlists', '2021', '03',
+                                 '2021-03-01.json')
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_playlist(self, playlist):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with open(self.path, 'w') as outfile:
+            json.dump(playlist, outfile, indent=4)
+
+    def get_playlist(self, **headers):
+        return self.client.get(
+            '/api/player/playlist/',
+            {'date': '2021-03-01', 'channel': self.config.id}, **headers)
+
+    def test_etag(self):
+        """
+        unchanged playlist is answered with 304
+        """
+        self.write_playlist(self.playlist)
+        response = self.get_playlist()
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.playlist)
+
+        response = self.get_playlist(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.playlist['program'].pop()
+        self.write_playlist(self.playlist)
+        response = self.get_playlist(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json(), self.playlist)
+
+    def test_missing_playlist(self):
+        response = self.get_playlist()
+        self.assertEqual(response.json()['success'], False)
+
+    def post_playlist(self, playlist):
+        return self.client.post(
+            '/api/player/playlist/',
+            {'data': playlist, 'channel': self.config.id}, format='json')
+
+    def test_save_playlist(self):
+        """
+        playlist is written atomic, unchanged playlist is not written
+        """
+        response = self.post_playlist(self.playlist)
+
+        self.assertEqual(response.json()['detail'],
+                         'Playlist from 2021-03-01 saved')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)),
+                         ['2021-03-01.json'])
+
+        with open(self.path) as playlist:
+            self.assertEqual(json.load(playlist), self.playlist)
+
+        mtime = os.stat(self.path).st_mtime_ns
+        response = self.post_playlist(self.playlist)
+
+        self.assertEqual(response.json()['detail'],
+                         'Playlist from 2021-03-01 already exists')
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+    def test_save_compact(self):
+        with self.settings(PLAYLIST_COMPACT=True):
+            self.post_playlist(self.playlist)
+
+        with open(self.path) as playlist:
+            self.assertNotIn('\n', playlist.read())
+
+    def patch_playlist(self, operations, date_='2021-03-01', **headers):
+        return self.client.patch(
+            '/api/player/playlist/',
+            {'date': date_, 'channel': self.config.id,
+             'operations': operations}, format='json', **headers)
+
+    def test_patch(self):
+        """
+        edit single entries and reject changes from outdated version
+        """
+        self.playlist = create_playlist(
+            '2021-03-01', ['/a.mp4', '/b.mp4', '/c.mp4'])
+        self.write_playlist(self.playlist)
+        etag = self.get_playlist()['ETag']
+        clip = {'in': 0, 'out': 5.0, 'duration': 5.0, 'source': '/d.mp4'}
+
+        response = self.patch_playlist([
+            {'op': 'move', 'from': 2, 'index': 0},
+            {'op': 'delete', 'index': 1},
+            {'op': 'insert', 'index': 2, 'value': clip},
+            {'op': 'replace', 'index': 1, 'value': dict(clip, out=2.0)}
+        ], HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        program = self.get_playlist().json()['program']
+        self.assertEqual([c['source'] for c in program],
+                         ['/c.mp4', '/d.mp4', '/d.mp4'])
+        self.assertEqual(program[1]['out'], 2.0)
+
+        response = self.patch_playlist([{'op': 'delete', 'index': 0}],
+                                       HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+        response = self.patch_playlist([{'op': 'delete', 'index': 3}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.get_playlist().json()['program']), 3)
+
+        for date_ in ['2021', '../../2021-03-01']:
+            response = self.patch_playlist([{'op': 'delete', 'index': 0}],
+                                           date_)
+            self.assertEqual(response.status_code, 400)
+
+
+class PlaylistBulkTests(APITestCase):
+    """
+    test import and export from many playlists
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.playlists = [create_playlist(f'2021-03-0{d}', ['/a.mp4'])
+                          for d in range(1, 4)]
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def export(self, output='ndjson'):
+        response = self.client.get(
+            '/api/player/playlist/bulk/',
+            {'channel': self.config.id, 'from': '2021-03-01',
+             'to': '2021-03-04', 'output': output})
+
+        return b''.join(response.streaming_content)
+
+    def test_import_export(self):
+        response = self.client.post(
+            '/api/player/playlist/bulk/',
+            {'channel': self.config.id,
+             'data': self.playlists + [{'date': 'x'}]}, format='json')
+
+        self.assertEqual([r['status'] for r in response.json()['results']],
+                         ['saved', 'saved', 'saved', 'error'])
+
+        lines = [json.loads(line) for line in self.export().splitlines()]
+
+        self.assertEqual(lines[:3], self.playlists)
+        self.assertEqual([r['status'] for r in lines[3]['results']],
+                         ['exported', 'exported', 'exported', 'missing'])
+
+        with tarfile.open(fileobj=io.BytesIO(self.export('tar'))) as tar:
+            self.assertEqual(tar.getnames(), [
+                '2021/03/2021-03-01.json', '2021/03/2021-03-02.json',
+                '2021/03/2021-03-03.json', 'results.json'])
+            self.assertEqual(
+                json.load(tar.extractfile('2021/03/2021-03-02.json')),
+                self.playlists[1])
+
+        response = self.client.get(
+            '/api/player/playlist/bulk/',
+            {'channel': 999, 'from': '2021-03-01', 'to': '2021-03-04'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_import_limit(self):
+        """
+        playlists over the limit get an error result
+        """
+        with self.settings(PLAYLIST_BULK_DAYS=2):
+            response = self.client.post(
+                '/api/player/playlist/bulk/',
+                {'channel': self.config.id, 'data': self.playlists},
+                format='json')
+
+        self.assertEqual([r['status'] for r in response.json()['results']],
+                         ['saved', 'saved', 'error'])
+        self.assertFalse(os.path.isfile(os.path.join(
+            self.tmp_dir, 'playlists', '2021', '03', '2021-03-03.json')))
+
+    def test_import_ndjson(self):
+        """
+        exported ndjson can be imported again
+        """
+        self.client.post('/api/player/playlist/bulk/',
+                         {'channel': self.config.id, 'data': self.playlists},
+                         format='json')
+        self.playlists[0]['program'].pop()
+        body = b'\n'.join(json.dumps(p).encode() for p in self.playlists)
+        body += b'\n' + self.export().splitlines()[-1]
+
+        response = self.client.post(
+            f'/api/player/playlist/bulk/?channel={self.config.id}',
+            body, content_type='application/x-ndjson')
+
+        self.assertEqual([r['status'] for r in response.json()['results']],
+                         ['saved', 'unchanged', 'unchanged'])
+
+
+class PlaylistValidateTests(APITestCase):
+    """
+    test checking sources, durations and length from playlists
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.clips = [os.path.join(self.tmp_dir, 'media', f'clip{i}.mp4')
+                      for i in range(2)]
+
+        for clip in self.clips:
+            with open(clip, 'wb') as outfile:
+                outfile.write(b'\0' * 16)
+
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def validate(self, playlist):
+        return self.client.post(
+            '/api/player/playlist/validate/',
+            {'channel': self.config.id, 'data': playlist},
+            format='json').json()
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=43200.0)
+    def test_valid(self, duration):
+        playlist = create_playlist('2021-03-01', self.clips, 43200.0)
+        result = self.validate(playlist)
+
+        self.assertTrue(result['valid'])
+        self.assertEqual(result['length'], 86400)
+
+        # second run reads durations from cache
+        self.validate(playlist)
+        self.assertEqual(duration.call_count, 2)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=10.0)
+    def test_invalid(self, duration):
+        playlist = create_playlist(
+            '2021-03-01', self.clips + ['/missing.mp4'], 20.0)
+        playlist['program'][2]['in'] = 30.0
+        result = self.validate(playlist)
+
+        self.assertFalse(result['valid'])
+        self.assertEqual(
+            [(e['index'], e['type']) for e in result['errors']],
+            [(0, 'duration'), (1, 'duration'), (2, 'missing'),
+             (2, 'range'), (None, 'gap')])
+
+        response = self.client.post(
+            '/api/player/playlist/',
+            {'channel': self.config.id, 'data': playlist, 'validate': True},
+            format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(os.path.isdir(
+            os.path.join(self.tmp_dir, 'playlists', '2021')))
+
+
+@override_settings(MEDIA_INDEX=False)
+class PlaylistGenerateTests(APITestCase):
+    """
+    test filling playlists from media folders
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+
+        for folder in ['movies', 'series']:
+            os.makedirs(os.path.join(self.tmp_dir, 'media', folder))
+
+            for i in range(3):
+                with open(os.path.join(self.tmp_dir, 'media', folder,
+                                       f'clip{i}.mp4'), 'wb') as outfile:
+                    outfile.write(b'\0' * 16)
+
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def generate(self, **kwargs):
+        return self.client.post(
+            '/api/player/playlist/generate/',
+            dict({'channel': self.config.id, 'from': '2021-03-01',
+                  'to': '2021-03-02', 'length': '00:01:00',
+                  'folders': ['/media/movies', '/media/series']},
+                 **kwargs), format='json').json()
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=25.0)
+    def test_rotation(self, duration):
+        playlists = self.generate()['playlists']
+
+        self.assertEqual([p['date'] for p in playlists],
+                         ['2021-03-01', '2021-03-02'])
+        self.assertEqual(
+            [os.path.relpath(c['source'], self.tmp_dir)
+             for c in playlists[1]['program']],
+            ['media/series/clip1.mp4', 'media/movies/clip2.mp4',
+             'media/series/clip2.mp4'])
+        self.assertEqual(sum(c['out'] for c in playlists[0]['program']), 60)
+        self.assertEqual(playlists[0]['program'][-1]['out'], 10)
+        self.assertEqual(duration.call_count, 6)
+
+    @patch('apps.api_player.utils.get_video_duration', return_value=25.0)
+    def test_shuffle_save(self, duration):
+        first = self.generate(mode='shuffle', seed=1)['playlists']
+        self.assertEqual(first, self.generate(mode='shuffle',
+                                              seed=1)['playlists'])
+
+        results = self.generate(mode='shuffle', seed=1, save=True)['results']
+        self.assertEqual([r['status'] for r in results], ['saved', 'saved'])
+
+        results = self.generate(save=True, overwrite=False)['results']
+        self.assertEqual([r['status'] for r in results], ['exists', 'exists'])
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from time import monotonic
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings
+from ..utils import StatsHistory, StatsSampler
+
+
+class StatisticsTests(APITestCase):
+    """
+    test system statistics
+    """
+
+    def setUp(self):
+        GuiSettings.objects.create(id=1, media_disk='/', net_interface='lo')
+        StatsSampler.sampler = None
+        self.tmp_dir = tempfile.mkdtemp()
+        history_dir = self.settings(STATS_HISTORY_DIR=self.tmp_dir)
+        history_dir.enable()
+        self.addCleanup(history_dir.disable)
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_stats_all(self):
+        """
+        statistics come from background sampler, without blocking
+        """
+        self.client.get('/api/player/stats/', {'stats': 'all'})
+
+        start = monotonic()
+        response = self.client.get('/api/player/stats/', {'stats': 'all'})
+
+        self.assertLess(monotonic() - start, 0.5)
+        self.assertEqual(response.status_code, 200)
+
+        for key in ['cpu_usage', 'cpu_load', 'ram_total', 'swap_total',
+                    'disk_total', 'net_send', 'net_speed_send']:
+            self.assertIn(key, response.json())
+
+        self.assertIsInstance(response.json()['net_speed_recv'][0], int)
+
+    def test_stats_names(self):
+        """
+        only statistics methods are public
+        """
+        for name in ['sample', 'sampler', 'history', '']:
+            response = self.client.get('/api/player/stats/', {'stats': name})
+            self.assertEqual(response.status_code, 404)
+
+    def test_stats_not_ready(self):
+        sampler = StatsSampler.get({})
+        sampler.stop.set()
+        sampler.thread.join()
+        sampler.samples.clear()
+        response = self.client.get('/api/player/stats/', {'stats': 'cpu'})
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_stats_history(self):
+        """
+        history endpoint returns columns from samples
+        """
+        response = self.client.get('/api/player/stats/history/',
+                                   {'fields': 'cpu_usage,ram_used'})
+
+        self.assertEqual(response.json()['resolution'], 'second')
+        self.assertEqual(sorted(response.json()),
+                         ['cpu_usage', 'ram_used', 'resolution', 'time'])
+        self.assertGreater(len(response.json()['time']), 0)
+
+        response = self.client.get('/api/player/stats/history/',
+                                   {'resolution': 'hour'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_interval_fraction(self):
+        with self.settings(STATS_INTERVAL=0.5, STATS_HISTORY_SECONDS=60):
+            history = StatsSampler().history['second']
+
+        history.append(1, {'cpu_usage': 10})
+
+        self.assertEqual(history.size, 120)
+        self.assertEqual(history.query()['cpu_usage'], [10])
+
+    def test_history_ring_buffer(self):
+        """
+        ring buffer keeps only the newest samples
+        """
+        history = StatsHistory(3)
+
+        for i in range(5):
+            history.append(i, {'cpu_usage': i * 10})
+
+        self.assertEqual(history.query(fields=['cpu_usage']),
+                         {'time': [2, 3, 4], 'cpu_usage': [20, 30, 40]})
+        self.assertEqual(history.query(start=3, end=3)['time'], [3])
+
+    def test_shared_history(self):
+        """
+        history file is shared between processes
+        """
+        path = os.path.join(self.tmp_dir, 'test.history')
+        writer = StatsHistory(3, path)
+        reader = StatsHistory(3, path)
+
+        for i in range(4):
+            writer.append(i, {'ram_used': i})
+
+        self.assertEqual(reader.query(fields=['ram_used']),
+                         {'time': [1, 2, 3], 'ram_used': [1, 2, 3]})
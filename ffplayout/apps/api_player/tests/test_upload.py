@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha256
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from ..models import GuiSettings, Upload
+from .test_media import create_config
+
+
+class ResumableUploadTests(APITestCase):
+    """
+    test uploading in chunks, with resuming from stored offset
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = GuiSettings.objects.create(
+            playout_config=create_config(self.tmp_dir))
+        self.media = os.path.join(self.tmp_dir, 'media')
+        self.data = os.urandom(100000)
+        self.user = User.objects.create_user('john', 'john@snow.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def create(self, path='/media', checksum=None, size=None):
+        return self.client.post('/api/player/media/upload/', {
+            'channel': self.config.id, 'path': path, 'filename': 'clip.mp4',
+            'size': len(self.data) if size is None else size,
+            'checksum': checksum or sha256(self.data).hexdigest()},
+            format='json')
+
+    def send(self, location, offset, data):
+        return self.client.patch(
+            location, data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_upload(self):
+        response = self.create()
+        location = response['Location']
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+        response = self.send(location, 0, self.data[:40000])
+        self.assertEqual(response['Upload-Offset'], '40000')
+
+        # wrong offset, from a lost response
+        response = self.send(location, 0, self.data[:40000])
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.head(location)
+        self.assertEqual(response['Upload-Offset'], '40000')
+        self.assertFalse(os.path.isfile(os.path.join(self.media,
+                                                     'clip.mp4')))
+
+        response = self.send(location, 40000, self.data[40000:])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('job', response.json())
+
+        with open(os.path.join(self.media, 'clip.mp4'), 'rb') as clip:
+            self.assertEqual(clip.read(), self.data)
+
+        self.assertEqual(os.listdir(self.media), ['clip.mp4'])
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(self.client.head(location).status_code, 404)
+
+    def test_checksum_mismatch(self):
+        location = self.create(checksum='0' * 64)['Location']
+        response = self.send(location, 0, self.data)
+
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(os.listdir(self.media), [])
+
+    def test_outside_storage(self):
+        response = self.create(path='/media/../../')
+        self.assertEqual(response.status_code, 404)
+
+    def test_negative_size(self):
+        response = self.create(size=-1)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(self.media), [])
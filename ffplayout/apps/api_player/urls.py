@@ -7,20 +7,34 @@ router = routers.DefaultRouter()
 router.register(r'user/users', views.UserViewSet)
 router.register(r'guisettings', views.GuiSettingsViewSet, 'guisettings')
 router.register(r'messenger', views.MessengerViewSet, 'messenger')
+router.register(r'jobs', views.JobViewSet, 'jobs')
 
 app_name = 'api_player'
 
 urlpatterns = [
     path('player/', include(router.urls)),
     path('player/config/', views.Config.as_view()),
+    path('player/live/', views.LiveEvents.as_view()),
     path('player/log/', views.LogReader.as_view()),
+    path('player/log/query/', views.LogQuery.as_view()),
     path('player/media/', views.Media.as_view()),
     path('player/media/op/', views.FileOperations.as_view()),
+    path('player/media/op/batch/', views.FileBatchOperations.as_view()),
+    path('player/media/search/', views.MediaSearch.as_view()),
+    path('player/media/stream/', views.MediaStream.as_view()),
+    path('player/media/upload/', views.ResumableUpload.as_view()),
+    path('player/media/upload/<uuid:upload_id>/',
+         views.ResumableUpload.as_view()),
     re_path(r'^player/media/upload/(?P<filename>[^/]+)$',
             views.FileUpload.as_view()),
     path('player/send/message/', views.MessageSender.as_view()),
+    path('player/send/message/batch/', views.MessageBatchSender.as_view()),
     path('player/playlist/', views.Playlist.as_view()),
+    path('player/playlist/bulk/', views.PlaylistBulk.as_view()),
+    path('player/playlist/generate/', views.PlaylistGenerate.as_view()),
+    path('player/playlist/validate/', views.PlaylistValidate.as_view()),
     path('player/stats/', views.Statistics.as_view()),
+    path('player/stats/history/', views.StatisticsHistory.as_view()),
     path('player/user/current/', views.CurrentUserView.as_view()),
     path('player/system/', views.SystemCtl.as_view()),
 ]
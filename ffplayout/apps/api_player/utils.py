@@ -1,35 +1,113 @@
+import errno
+import fcntl
+import gzip
+import io
 import json
+import lzma
+import mmap
 import os
 import re
-from datetime import datetime
+import shutil
+import tarfile
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from copy import deepcopy
+from datetime import datetime, timedelta
+from hashlib import sha1, sha256
+from heapq import nsmallest
+from itertools import cycle
 from platform import uname
-from subprocess import PIPE, STDOUT, run
-from time import sleep
+from random import Random
+from subprocess import DEVNULL, PIPE, STDOUT, TimeoutExpired, run
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time
 from xmlrpc.client import ServerProxy
 
 import psutil
 import yaml
 import zmq
-from apps.api_player.models import GuiSettings
+from apps.api_player.models import (GuiSettings, Job, MediaCache,
+                                    MediaIndex, Upload)
 from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from natsort import natsorted
 from pymediainfo import MediaInfo
 from rest_framework.response import Response
 
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from gevent import monkey
+    from gevent.threadpool import ThreadPoolExecutor as GeventPoolExecutor
+except ImportError:
+    monkey = None
+
+
+# C implementation from yaml loader is much faster, when it is available
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+GUI_CONFIG_CACHE = {}
+YAML_CACHE = {}
+
+
+@receiver([post_save, post_delete], sender=GuiSettings)
+def clear_config_cache(**kwargs):
+    """
+    invalidate cached gui settings, when they are changed in this process,
+    other processes get the change after CONFIG_CACHE_TTL seconds
+    """
+    GUI_CONFIG_CACHE.clear()
+
 
 def gui_config(index):
+    cached = GUI_CONFIG_CACHE.get(str(index))
+
+    if cached and cached[0] > monotonic():
+        return dict(cached[1])
+
     gui_settings = GuiSettings.objects.filter(id=index).values()
+    config = gui_settings[0] if gui_settings else {}
+    GUI_CONFIG_CACHE[str(index)] = (
+        monotonic() + settings.CONFIG_CACHE_TTL, config)
 
-    return gui_settings[0] if gui_settings else {}
+    return dict(config)
 
 
 def read_yaml(channel):
     config = gui_config(channel)
 
-    if config.get('playout_config') and \
-            os.path.isfile(config['playout_config']):
-        with open(config['playout_config'], 'r') as config_file:
-            return yaml.safe_load(config_file)
+    if config.get('playout_config'):
+        try:
+            stat = os.stat(config['playout_config'])
+        except OSError:
+            return None
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = YAML_CACHE.get(config['playout_config'])
+
+        if not cached or cached[0] != version:
+            with open(config['playout_config'], 'r') as config_file:
+                cached = (version, yaml.load(config_file, Loader=YamlLoader))
+
+            YAML_CACHE[config['playout_config']] = cached
+
+        return deepcopy(cached[1])
 
     return None
 
@@ -38,421 +116,2869 @@ def write_yaml(data, channel):
     config = gui_config(channel)
 
     if config.get('playout_config'):
+        YAML_CACHE.pop(config['playout_config'], None)
+
         with open(config['playout_config'], 'w') as outfile:
             yaml.dump(data, outfile, default_flow_style=False,
                       sort_keys=False, indent=4)
 
 
-def read_json(date_, channel):
-    config = read_yaml(channel)
+def playlist_path(date_, config):
+    """
+    return path from playlist file
+    """
+    year, month, _ = date_.split('-')
 
-    if config:
-        playlist_path = config['playlist']['path']
-        year, month, _ = date_.split('-')
-        input_ = os.path.join(playlist_path, year, month, f'{date_}.json')
+    return os.path.join(config['playlist']['path'], year, month,
+                        f'{date_}.json')
 
-        if os.path.isfile(input_):
-            with open(input_, 'r') as playlist:
-                return json.load(playlist)
 
-    return None
+PLAYLIST_CACHE = OrderedDict()
+PLAYLIST_LOCK = Lock()
 
 
-def write_json(data, channel):
-    config = read_yaml(channel)
+def playlist_hash(data):
+    """
+    hash from playlist content, independent of formatting
+    """
+    return sha256(json.dumps(data, sort_keys=True, separators=(',', ':'))
+                  .encode()).hexdigest()
 
-    if config:
-        playlist_path = config['playlist']['path']
-        year, month, _ = data['date'].split('-')
-        playlist = os.path.join(playlist_path, year, month)
 
-        if not os.path.isdir(playlist):
-            os.makedirs(playlist, exist_ok=True)
+def cache_playlist(path, data, raw, version):
+    entry = {
+        'version': version,
+        'data': data,
+        'hash': playlist_hash(data),
+        'etag': '"{}"'.format(sha256(raw).hexdigest()),
+        'content': json.dumps(data, ensure_ascii=False,
+                              separators=(',', ':')).encode()
+    }
 
-        output = os.path.join(playlist, f'{data["date"]}.json')
+    with PLAYLIST_LOCK:
+        PLAYLIST_CACHE[path] = entry
 
-        if os.path.isfile(output) and data == read_json(data['date'], channel):
-            return Response(
-                {'detail': f'Playlist from {data["date"]} already exists'})
+        while len(PLAYLIST_CACHE) > settings.PLAYLIST_CACHE_SIZE:
+            PLAYLIST_CACHE.popitem(last=False)
 
-        with open(output, "w") as outfile:
-            json.dump(data, outfile, indent=4)
+    return entry
 
-        return Response({'detail': f'Playlist from {data["date"]} saved'})
 
-    return Response({'detail': f'Saving playlist from {data["date"]} failed!'})
+def load_playlist(path):
+    """
+    return cached playlist with etag and serialized content,
+    file is only read again, when it was changed
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        with PLAYLIST_LOCK:
+            PLAYLIST_CACHE.pop(path, None)
+        return None
 
+    version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
 
-def read_log(type_, date_, channel):
-    config = read_yaml(channel)
-    if config and config.get('logging'):
-        log_path = config['logging']['log_path']
+    with PLAYLIST_LOCK:
+        entry = PLAYLIST_CACHE.get(path)
 
-        if date_ == datetime.now().strftime('%Y-%m-%d'):
-            log_file = os.path.join(log_path, '{}.log'.format(type_))
-        else:
-            log_file = os.path.join(log_path, '{}.log.{}'.format(type_, date_))
+        if entry and entry['version'] == version:
+            PLAYLIST_CACHE.move_to_end(path)
+            return entry
 
-        if os.path.isfile(log_file):
-            with open(log_file, 'r') as log:
-                return log.read().strip()
+    with open(path, 'rb') as playlist:
+        raw = playlist.read()
 
-    return None
+    return cache_playlist(path, json.loads(raw), raw, version)
 
 
-def send_message(data, channel):
+def playlist_entry(date_, channel):
     config = read_yaml(channel)
-    drawtext_cmd = ':'.join(f"{key}='{val}'" for key, val in data.items())
-    request = f"{settings.DRAW_TEXT_NODE} reinit {drawtext_cmd}"
 
     if config:
-        if settings.MULTI_CHANNEL:
-            address = settings.SOCKET_IP
-            port = config['text']['bind_address'].split(':')[1]
-        else:
-            address, port = config['text']['bind_address'].split(':')
+        return load_playlist(playlist_path(date_, config))
 
-        context = zmq.Context(1)
-        client = context.socket(zmq.REQ)
-        client.connect('tcp://{}:{}'.format(address, port))
+    return None
 
-        poll = zmq.Poller()
-        poll.register(client, zmq.POLLIN)
-        client.send_string(request)
-        socks = dict(poll.poll(settings.REQUEST_TIMEOUT))
 
-        if socks.get(client) == zmq.POLLIN:
-            reply_msg = client.recv_string()
-        else:
-            reply_msg = 'No response from server'
+def read_json(date_, channel):
+    entry = playlist_entry(date_, channel)
 
-        client.setsockopt(zmq.LINGER, 0)
-        client.close()
-        poll.unregister(client)
+    if entry:
+        return deepcopy(entry['data'])
 
-        context.term()
-        return {'Success': reply_msg}
+    return None
 
-    return {'Failed': 'No config exists'}
 
+def write_atomic(path, content):
+    """
+    write to temporary file and rename it to the target,
+    so the engine never reads a half written file
+    """
+    folder = os.path.dirname(path)
 
-def sizeof_fmt(num, suffix='B'):
-    for unit in ['', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi']:
-        if abs(num) < 1024.0:
-            return "%3.1f%s%s" % (num, unit, suffix)
-        num /= 1024.0
-    return "%.1f%s%s" % (num, 'Yi', suffix)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o644
 
+    fd, tmp_file = tempfile.mkstemp(
+        dir=folder, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
 
-class EngineControlSystemD:
-    """
-    class for controlling the systemd service from ffplayout-engine
-    """
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.write(content)
+            outfile.flush()
+            os.fsync(outfile.fileno())
 
-    def __init__(self):
-        self.service = ['ffplayout_engine.service']
-        self.cmd = ['sudo', '/bin/systemctl']
-        self.proc = None
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
 
-    def run_cmd(self):
-        self.proc = run(self.cmd + self.service, stdout=PIPE, stderr=STDOUT,
-                        check=False, encoding="utf-8").stdout
+    dir_fd = os.open(folder, os.O_RDONLY)
 
-    def start(self):
-        self.cmd.append('start')
-        self.run_cmd()
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
 
-    def stop(self):
-        self.cmd.append('stop')
-        self.run_cmd()
 
-    def reload(self):
-        self.cmd.append('reload')
-        self.run_cmd()
+def save_playlist(data, config):
+    """
+    save playlist atomic, return False when it is unchanged
+    """
+    output = playlist_path(data['date'], config)
 
-    def restart(self):
-        self.cmd.append('restart')
-        self.run_cmd()
+    if not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
 
-    def status(self):
-        self.cmd.append('is-active')
-        self.run_cmd()
+    entry = load_playlist(output)
 
-        return self.proc.replace('\n', '')
+    if entry and entry['hash'] == playlist_hash(data):
+        return False
 
+    if settings.PLAYLIST_COMPACT:
+        raw = json.dumps(data, separators=(',', ':')).encode()
+    else:
+        raw = json.dumps(data, indent=4).encode()
 
-class EngineControlSocket:
-    """
-    class for controlling ffplayout_engine over supervisord socket
-    """
+    write_atomic(output, raw)
+    stat = os.stat(output)
+    cache_playlist(output, data, raw,
+                   (stat.st_ino, stat.st_size, stat.st_mtime_ns))
 
-    def __init__(self):
-        self.engine = None
-        self.server = ServerProxy(
-            f'http://{settings.SOCKET_USER}:{settings.SOCKET_PASS}'
-            f'@{settings.SOCKET_IP}:{settings.SOCKET_PORT}/RPC2')
-        self.process = None
+    return True
 
-        try:
-            self.proc_list = self.server.supervisor.getAllProcessInfo()
-        except Exception:
-            self.proc_list = []
 
-    def get_process(self, engine):
-        self.engine = engine
-        self.process = None
+def import_playlists(playlists, channel, overwrite=True, limit=None):
+    """
+    save playlists from many days in one pass, return result per day,
+    playlists over limit are not saved and get an error
+    """
+    config = read_yaml(channel)
 
-        for proc in self.proc_list:
-            if engine == proc.get('name'):
-                self.process = proc
-                break
+    if not config:
+        return None
 
-    def start(self):
-        if not self.process:
-            return self.add_process()
-        elif self.status() == 'STOPPED':
-            return self.server.supervisor.startProcess(self.engine)
+    results = []
 
-    def stop(self):
-        if self.process and self.process.get('statename') == 'RUNNING':
-            return self.server.supervisor.stopProcessGroup(self.engine)
+    for data in playlists:
+        date_ = data.get('date') if isinstance(data, dict) else None
 
-    def restart(self):
-        self.stop()
-        sleep(2)
-        self.start()
+        try:
+            datetime.strptime(date_, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            results.append({'date': date_, 'status': 'error',
+                            'detail': 'Invalid playlist'})
+            continue
 
-    def reload(self):
-        if self.process:
-            return self.server.supervisor.signalProcess(self.engine,
-                                                        'SIGHUP')
+        if limit is not None and len(results) >= limit:
+            results.append({'date': date_, 'status': 'error',
+                            'detail': f'More than {limit} days'})
+            continue
 
-    def add_process(self):
-        return self.server.supervisor.addProcessGroup(self.engine)
+        if not overwrite and load_playlist(playlist_path(date_, config)):
+            results.append({'date': date_, 'status': 'exists'})
+            continue
 
-    def remove_process(self, engine):
-        return self.server.supervisor.removeProcessGroup(engine)
+        try:
+            status = 'saved' if save_playlist(data, config) else 'unchanged'
+            results.append({'date': date_, 'status': status})
+        except OSError as error:
+            results.append({'date': date_, 'status': 'error',
+                            'detail': error.strerror})
 
-    def status(self):
-        if self.process:
-            info = self.server.supervisor.getProcessInfo(self.engine)
-            return info.get('statename')
+    return results
 
 
-class SystemControl:
+def ndjson_playlists(stream):
     """
-    controlling the ffplayout_engine over systemd services,
-    or over a socket connecting
+    parse newline delimited playlists, summary line from export is skipped
     """
+    for line in stream:
+        if not line.strip():
+            continue
 
-    def run_cmd(self, service, cmd):
-        if cmd == 'start':
-            service.start()
-            return 200
-        if cmd == 'stop':
-            service.stop()
-            return 200
-        if cmd == 'reload':
-            service.reload()
-            return 200
-        if cmd == 'restart':
-            service.restart()
-            return 200
-        if cmd == 'status':
-            return {"data": service.status()}
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield None
+            continue
 
-        return 400
+        if not (isinstance(data, dict) and list(data) == ['results']):
+            yield data
 
-    def systemd(self, cmd):
-        return self.run_cmd(EngineControlSystemD(), cmd)
 
-    def rpc_socket(self, cmd, engine):
-        sock = EngineControlSocket()
-        sock.get_process(engine)
+class TarStream:
+    """
+    file object for tarfile, which collects written blocks
+    """
 
-        return self.run_cmd(sock, cmd)
+    def __init__(self):
+        self.chunks = []
 
-    def run_service(self, cmd, channel=None):
-        if settings.MULTI_CHANNEL:
-            config = gui_config(channel)
-            return self.rpc_socket(cmd, config.get('engine_service'))
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
 
-        return self.systemd(cmd)
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
 
 
-class SystemStats:
+def export_playlists(config, date_from, date_to, format_='ndjson'):
     """
-    get system statistics
+    generator for playlists in date range, as ndjson or tar stream,
+    last entry contains the result per day
     """
+    results = []
+    tar_stream = TarStream()
+    tar = tarfile.open(fileobj=tar_stream, mode='w|') \
+        if format_ == 'tar' else None
 
-    def __init__(self):
-        self.config = gui_config(1)
+    for day in range((date_to - date_from).days + 1):
+        date_ = (date_from + timedelta(days=day)).strftime('%Y-%m-%d')
 
-    def all(self):
-        if self.config:
-            return {
-                **self.system(), **self.settings(),
-                **self.cpu(), **self.ram(), **self.swap(),
-                **self.disk(), **self.net(), **self.net_speed()
-            }
+        try:
+            entry = load_playlist(playlist_path(date_, config))
+        except (OSError, ValueError):
+            results.append({'date': date_, 'status': 'error'})
+            continue
+
+        if not entry:
+            results.append({'date': date_, 'status': 'missing'})
+            continue
+
+        results.append({'date': date_, 'status': 'exported'})
+
+        if tar:
+            info = tarfile.TarInfo(f'{date_[:4]}/{date_[5:7]}/{date_}.json')
+            info.size = len(entry['content'])
+            info.mtime = entry['version'][2] / 1000000000
+            tar.addfile(info, io.BytesIO(entry['content']))
+            yield tar_stream.pop()
+        else:
+            yield entry['content'] + b'\n'
 
-    def system(self):
-        return {
-            'system': uname().system,
-            'node': uname().node,
-            'machine': uname().machine
-        }
+    summary = json.dumps({'results': results}).encode()
 
-    def settings(self):
-        return {
-            'timezone': settings.TIME_ZONE,
-            'multi_channel': settings.MULTI_CHANNEL
-        }
+    if tar:
+        info = tarfile.TarInfo('results.json')
+        info.size = len(summary)
+        info.mtime = time()
+        tar.addfile(info, io.BytesIO(summary))
+        tar.close()
+        yield tar_stream.pop()
+    else:
+        yield summary + b'\n'
 
-    def cpu(self):
-        load = psutil.getloadavg()
-        return {
-            'cpu_usage': psutil.cpu_percent(interval=1),
-            'cpu_load': [
-                '{:.2f}'.format(load[0]),
-                '{:.2f}'.format(load[1]),
-                '{:.2f}'.format(load[2])
-            ]
-        }
 
-    def ram(self):
-        mem = psutil.virtual_memory()
-        return {
-            'ram_total': [mem.total, sizeof_fmt(mem.total)],
-            'ram_used': [mem.used, sizeof_fmt(mem.used)],
-            'ram_free': [mem.free, sizeof_fmt(mem.free)],
-            'ram_cached': [mem.cached, sizeof_fmt(mem.cached)]
-        }
+def apply_operations(program, operations):
+    """
+    apply insert, move, delete and replace operations on program list,
+    entries which are not touched are not copied
+    """
+    program = list(program)
 
-    def swap(self):
-        swap = psutil.swap_memory()
-        return {
-            'swap_total': [swap.total, sizeof_fmt(swap.total)],
-            'swap_used': [swap.used, sizeof_fmt(swap.used)],
-            'swap_free': [swap.free, sizeof_fmt(swap.free)]
-        }
+    for operation in operations:
+        op = operation.get('op')
+        index = operation.get('index')
+        last = len(program) if op == 'insert' else len(program) - 1
 
-    def disk(self):
-        if 'media_disk' in self.config and self.config['media_disk']:
-            root = psutil.disk_usage(self.config['media_disk'])
-            return {
-                'disk_total': [root.total, sizeof_fmt(root.total)],
-                'disk_used': [root.used, sizeof_fmt(root.used)],
-                'disk_free': [root.free, sizeof_fmt(root.free)]
-            }
+        if not isinstance(index, int) or not 0 <= index <= last:
+            raise ValueError(f'Index {index} out of range')
 
-    def net(self):
-        net = psutil.net_io_counters()
-        return {
-            'net_send': [net.bytes_sent, sizeof_fmt(net.bytes_sent)],
-            'net_recv': [net.bytes_recv, sizeof_fmt(net.bytes_recv)],
-            'net_errin': net.errin,
-            'net_errout': net.errout
-        }
+        if op in ('insert', 'replace'):
+            if not isinstance(operation.get('value'), dict):
+                raise ValueError(f'Operation {op} needs a clip as value')
 
-    def net_speed(self):
-        net = psutil.net_if_stats()
+            if op == 'insert':
+                program.insert(index, operation['value'])
+            else:
+                program[index] = operation['value']
+        elif op == 'delete':
+            del program[index]
+        elif op == 'move':
+            from_ = operation.get('from')
 
-        if 'net_interface' not in self.config or \
-                not self.config['net_interface']:
-            return
+            if not isinstance(from_, int) or not 0 <= from_ < len(program):
+                raise ValueError(f'Index {from_} out of range')
 
-        if self.config['net_interface'] not in net:
-            return {
-                'net_speed_send': 'no network interface set!',
-                'net_speed_recv': 'no network interface set!'
-            }
+            program.insert(index, program.pop(from_))
+        else:
+            raise ValueError(f'Unknown operation {op}')
 
-        net = psutil.net_io_counters(pernic=True)[self.config['net_interface']]
+    return program
 
-        send_start = net.bytes_sent
-        recv_start = net.bytes_recv
 
-        sleep(1)
+def patch_playlist(date_, channel, operations, etags=None):
+    """
+    edit program entries from playlist, when etag is given
+    and playlist was changed in meantime, answer with 412
+    """
+    config = read_yaml(channel)
 
-        net = psutil.net_io_counters(pernic=True)[self.config['net_interface']]
+    if not config:
+        return Response({'detail': 'Channel not found'}, status=404)
 
-        send_end = net.bytes_sent
-        recv_end = net.bytes_recv
+    try:
+        datetime.strptime(date_, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return Response({'detail': 'Invalid date'}, status=400)
 
-        send_sec = send_end - send_start
-        recv_sec = recv_end - recv_start
+    output = playlist_path(date_, config)
 
-        return {
-            'net_speed_send': [send_sec, sizeof_fmt(send_sec)],
-            'net_speed_recv': [recv_sec, sizeof_fmt(recv_sec)]
-        }
+    if not os.path.isdir(os.path.dirname(output)):
+        return Response({'detail': f'Playlist from {date_} not found!'},
+                        status=404)
 
+    # lock playlist folder, for editing from other workers
+    lock = os.open(os.path.dirname(output), os.O_RDONLY)
 
-def get_video_duration(clip):
-    """
-    return video duration from container
-    """
-    media_info = MediaInfo.parse(clip)
-    duration = 0
-    for track in media_info.tracks:
-        if track.track_type == 'General':
-            try:
-                duration = float(
-                    track.to_data()["duration"]) / 1000
-                break
-            except KeyError:
-                pass
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        entry = load_playlist(output)
 
-    return duration
+        if not entry:
+            return Response({'detail': f'Playlist from {date_} not found!'},
+                            status=404)
 
+        if etags and entry['etag'] not in etags and '*' not in etags:
+            response = Response(
+                {'detail': f'Playlist from {date_} was changed'}, status=412)
+            response['ETag'] = entry['etag']
+            return response
 
-def get_path(input_, media_folder):
+        try:
+            data = dict(entry['data'], program=apply_operations(
+                entry['data'].get('program', []), operations))
+        except (AttributeError, TypeError, ValueError) as error:
+            return Response({'detail': str(error)}, status=400)
+
+        save_playlist(data, config)
+        entry = load_playlist(output)
+    finally:
+        os.close(lock)
+
+    response = Response({'detail': f'Playlist from {date_} saved'})
+    response['ETag'] = entry['etag']
+
+    return response
+
+
+def write_json(data, channel, validate=False):
+    config = read_yaml(channel)
+
+    if config:
+        if validate:
+            result = validate_playlist(data, config)
+
+            if not result['valid']:
+                return Response(result, status=400)
+
+        if not save_playlist(data, config):
+            return Response(
+                {'detail': f'Playlist from {data["date"]} already exists'})
+
+        return Response({'detail': f'Playlist from {data["date"]} saved'})
+
+    return Response({'detail': f'Saving playlist from {data["date"]} failed!'})
+
+
+def log_file_path(type_, date_, config):
+    """
+    return path from log file, rotated logs can be compressed
+    """
+    log_path = config['logging']['log_path']
+
+    if date_ == datetime.now().strftime('%Y-%m-%d'):
+        return os.path.join(log_path, '{}.log'.format(type_))
+
+    log_file = os.path.join(log_path, '{}.log.{}'.format(type_, date_))
+
+    for ext in ['', '.gz', '.xz', '.zst']:
+        if ext == '.zst' and zstandard is None:
+            continue
+
+        if os.path.isfile(log_file + ext):
+            return log_file + ext
+
+    return log_file
+
+
+class ZstdReader(io.RawIOBase):
+    """
+    seekable reader for zstd compressed files,
+    seeking backwards decompresses again from the beginning
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.reader = None
+        self.position = 0
+        self.rewind()
+
+    def rewind(self):
+        if self.reader:
+            self.reader.close()
+
+        self.reader = zstandard.ZstdDecompressor().stream_reader(
+            open(self.path, 'rb'), closefd=True)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.reader.readinto(buffer)
+        self.position += size
+
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            while self.read(65536):
+                pass
+
+            offset += self.position
+
+        if offset < self.position:
+            self.rewind()
+
+        while self.position < offset and \
+                self.read(min(65536, offset - self.position)):
+            pass
+
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if self.reader:
+            self.reader.close()
+
+        super().close()
+
+
+COMPRESSED_LOGS = ('.gz', '.xz', '.zst')
+
+
+def open_log(log_file):
+    """
+    open log file for binary reading,
+    compressed logs are decompressed while reading
+    """
+    if log_file.endswith('.gz'):
+        return gzip.open(log_file, 'rb')
+    if log_file.endswith('.xz'):
+        return lzma.open(log_file, 'rb')
+    if log_file.endswith('.zst'):
+        return io.BufferedReader(ZstdReader(log_file))
+
+    return open(log_file, 'rb')
+
+
+def read_log_offset(log, offset, limit, compressed=False):
+    """
+    read complete lines from byte offset on, return text and next offset
+    """
+    if not compressed and os.fstat(log.fileno()).st_size < offset:
+        # log was truncated or rotated
+        offset = 0
+
+    if log.seek(offset) < offset:
+        # compressed log is shorter
+        offset = log.seek(0)
+
+    chunk = log.read(limit)
+
+    if b'\n' in chunk or len(chunk) < limit:
+        # keep last incomplete line for the next read
+        chunk = chunk[:chunk.rfind(b'\n') + 1]
+
+    return chunk.decode(errors='replace'), offset + len(chunk)
+
+
+def read_log_tail(log, lines, compressed=False):
+    """
+    read the last lines, backwards from end of file,
+    compressed logs can only be read forwards
+    """
+    if compressed:
+        last_lines = deque(log, maxlen=lines + 1)
+        text = b''.join(last_lines).decode(errors='replace').rstrip('\n')
+
+        return '\n'.join(text.split('\n')[-lines:]) if lines else '', \
+            log.tell()
+
+    log.seek(0, os.SEEK_END)
+    size = log.tell()
+    position = size
+    chunk = b''
+
+    while position > 0 and chunk.count(b'\n') <= lines:
+        step = min(65536, position)
+        position -= step
+        log.seek(position)
+        chunk = log.read(step) + chunk
+
+    text = chunk.decode(errors='replace').rstrip('\n')
+
+    return '\n'.join(text.split('\n')[-lines:]) if lines else '', size
+
+
+def read_log(type_, date_, channel, offset=None, tail=None):
+    """
+    read log file complete, from byte offset or only the last lines,
+    return log and offset for the next incremental read
+    """
+    config = read_yaml(channel)
+    if config and config.get('logging'):
+        log_file = log_file_path(type_, date_, config)
+
+        if os.path.isfile(log_file):
+            compressed = log_file.endswith(COMPRESSED_LOGS)
+
+            with open_log(log_file) as log:
+                if tail is not None:
+                    text, next_offset = read_log_tail(log, tail, compressed)
+                elif offset is not None:
+                    text, next_offset = read_log_offset(
+                        log, offset, settings.LOG_CHUNK_SIZE, compressed)
+                else:
+                    text = log.read().decode(errors='replace').strip()
+                    next_offset = log.tell()
+
+            return {'log': text, 'offset': next_offset}
+
+    return None
+
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+LOG_LINE = re.compile(
+    rb'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})[.,]?\d*\]'
+    rb'\s*\[\s*([A-Z]+)\s*\]')
+ANSI_CODE = re.compile(rb'\x1b\[[0-9;]*m')
+
+
+class LogIndex:
+    """
+    index from log records with byte offset, time and level,
+    lines without timestamp belongs to the previous record
+    """
+    indexes = OrderedDict()
+    lock = Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.update_lock = Lock()
+        self.reset(None)
+
+    def reset(self, inode):
+        self.inode = inode
+        self.size = 0
+        self.end = 0
+        self.offsets = array('Q')
+        self.times = array('d')
+        self.levels = array('B')
+
+    @classmethod
+    def get(cls, path):
+        """
+        return up to date index from log file
+        """
+        with cls.lock:
+            if path not in cls.indexes:
+                cls.indexes[path] = cls(path)
+
+            cls.indexes.move_to_end(path)
+
+            while len(cls.indexes) > settings.LOG_INDEX_FILES:
+                cls.indexes.popitem(last=False)
+
+            index = cls.indexes[path]
+
+        with index.update_lock:
+            index.update()
+
+        return index
+
+    def update(self):
+        """
+        index only new lines, when log was appended
+        """
+        stat = os.stat(self.path)
+
+        if stat.st_size == self.size and stat.st_ino == self.inode:
+            return
+
+        if stat.st_ino != self.inode or stat.st_size < self.size or \
+                self.path.endswith(COMPRESSED_LOGS):
+            # new, rotated or compressed log, index it from the beginning
+            self.reset(stat.st_ino)
+
+        self.size = stat.st_size
+
+        with open_log(self.path) as log:
+            log.seek(self.end)
+            offset = self.end
+
+            for line in log:
+                if not line.endswith(b'\n'):
+                    break
+
+                match = LOG_LINE.match(ANSI_CODE.sub(b'', line))
+
+                if match:
+                    level = match.group(2).decode()
+                    self.offsets.append(offset)
+                    self.times.append(datetime.strptime(
+                        match.group(1).decode(),
+                        '%Y-%m-%d %H:%M:%S').timestamp())
+                    self.levels.append(LOG_LEVELS.index(level)
+                                       if level in LOG_LEVELS else 255)
+
+                offset += len(line)
+
+            self.end = offset
+
+    def query(self, levels=None, start=None, end=None, search=None,
+              limit=1000):
+        """
+        return records which matches all filters
+        """
+        first = bisect_left(self.times, start) if start else 0
+        last = bisect_right(self.times, end) if end else len(self.times)
+        levels = {LOG_LEVELS.index(level) for level in levels
+                  if level in LOG_LEVELS} if levels else None
+        search = search.lower() if search else None
+        records = []
+
+        with open_log(self.path) as log:
+            for i in range(first, last):
+                if levels is not None and self.levels[i] not in levels:
+                    continue
+
+                stop = self.offsets[i + 1] if i + 1 < len(self.offsets) \
+                    else self.end
+                log.seek(self.offsets[i])
+                text = ANSI_CODE.sub(b'', log.read(stop - self.offsets[i]))
+                text = text.decode(errors='replace')
+                message = text[text.index(']', text.index(']') + 1) + 1:]
+
+                if search and search not in message.lower():
+                    continue
+
+                records.append({
+                    'time': text[1:20],
+                    'level': LOG_LEVELS[self.levels[i]]
+                    if self.levels[i] < len(LOG_LEVELS) else 'UNKNOWN',
+                    'message': message.strip()
+                })
+
+                if len(records) >= limit:
+                    break
+
+        return records
+
+
+def query_logs(type_, channel, date_from, date_to, levels=None, start=None,
+               end=None, search=None, limit=1000):
+    """
+    search records in logs from a date range, rotated logs included
+    """
+    config = read_yaml(channel)
+
+    if not config or not config.get('logging'):
+        return None
+
+    records = []
+    date_ = date_from
+
+    while date_ <= date_to and len(records) < limit:
+        log_file = log_file_path(type_, date_.strftime('%Y-%m-%d'), config)
+
+        if os.path.isfile(log_file):
+            records += LogIndex.get(log_file).query(
+                levels, start, end, search, limit - len(records))
+
+        date_ += timedelta(days=1)
+
+    return records
+
+
+class ZmqPool:
+    """
+    process wide zmq context, with a pool of connected REQ sockets
+    per address, for reusing connections between requests
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.pid = None
+        self.context = None
+        self.sockets = {}
+
+    def acquire(self, address):
+        with self.lock:
+            if self.pid != os.getpid():
+                # context can not be shared with forked worker processes
+                self.pid = os.getpid()
+                self.context = zmq.Context(1)
+                self.sockets = {}
+
+            if self.sockets.get(address):
+                return self.sockets[address].pop()
+
+            client = self.context.socket(zmq.REQ)
+            client.setsockopt(zmq.LINGER, 0)
+            client.connect(address)
+
+            return client
+
+    def release(self, address, client):
+        with self.lock:
+            idle = self.sockets.setdefault(address, [])
+
+            if client.closed or len(idle) >= settings.ZMQ_POOL_SIZE:
+                client.close()
+            else:
+                idle.append(client)
+
+    def request(self, address, message, timeout):
+        """
+        send message and wait for reply, return None after timeout
+        """
+        client = self.acquire(address)
+        poll = zmq.Poller()
+        poll.register(client, zmq.POLLIN)
+
+        try:
+            client.send_string(message)
+
+            if dict(poll.poll(timeout)).get(client) == zmq.POLLIN:
+                reply = client.recv_string()
+                self.release(address, client)
+                return reply
+        except zmq.ZMQError:
+            pass
+
+        # REQ socket waits for a reply forever, so it can not be used again
+        client.close()
+
+        return None
+
+
+ZMQ_POOL = ZmqPool()
+
+
+def drawtext_request(data):
+    drawtext_cmd = ':'.join(f"{key}='{val}'" for key, val in data.items())
+
+    return f"{settings.DRAW_TEXT_NODE} reinit {drawtext_cmd}"
+
+
+def engine_address(config):
+    """
+    return zmq address from engine text socket
+    """
+    if settings.MULTI_CHANNEL:
+        address = settings.SOCKET_IP
+        port = config['text']['bind_address'].split(':')[1]
+    else:
+        address, port = config['text']['bind_address'].split(':')
+
+    return 'tcp://{}:{}'.format(address, port)
+
+
+def preset_to_drawtext(preset):
+    """
+    convert message preset to drawtext parameters
+    """
+    return {
+        'text': preset.message,
+        'x': preset.x,
+        'y': preset.y,
+        'fontsize': preset.font_size,
+        'line_spacing': preset.font_spacing,
+        'fontcolor': f'{preset.font_color}@{preset.font_alpha}',
+        'box': 1 if preset.show_box else 0,
+        'boxcolor': f'{preset.box_color}@{preset.box_alpha}',
+        'boxborderw': preset.border_width,
+        'alpha': preset.overall_alpha
+    }
+
+
+def send_message(data, channel):
+    config = read_yaml(channel)
+
+    if config:
+        reply_msg = ZMQ_POOL.request(engine_address(config),
+                                     drawtext_request(data),
+                                     settings.REQUEST_TIMEOUT)
+
+        if reply_msg is None:
+            reply_msg = 'No response from server'
+
+        return {'Success': reply_msg}
+
+    return {'Failed': 'No config exists'}
+
+
+def send_messages(data, channels):
+    """
+    send message to multiple channels concurrently,
+    so all together takes maximal one request timeout
+    """
+    request = drawtext_request(data)
+    addresses = {}
+    results = {}
+
+    for channel in channels:
+        config = read_yaml(channel)
+
+        if config:
+            addresses[str(channel)] = engine_address(config)
+        else:
+            results[str(channel)] = {'Failed': 'No config exists'}
+
+    if addresses:
+        with ThreadPoolExecutor(max_workers=min(len(addresses), 32)) as pool:
+            replies = pool.map(
+                lambda address: ZMQ_POOL.request(
+                    address, request, settings.REQUEST_TIMEOUT),
+                addresses.values())
+
+            for channel, reply_msg in zip(addresses, replies):
+                if reply_msg is None:
+                    reply_msg = 'No response from server'
+
+                results[channel] = {'Success': reply_msg}
+
+    return results
+
+
+def sizeof_fmt(num, suffix='B'):
+    for unit in ['', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi']:
+        if abs(num) < 1024.0:
+            return "%3.1f%s%s" % (num, unit, suffix)
+        num /= 1024.0
+    return "%.1f%s%s" % (num, 'Yi', suffix)
+
+
+class EngineControlSystemD:
+    """
+    class for controlling the systemd service from ffplayout-engine
+    """
+
+    def __init__(self):
+        self.service = ['ffplayout_engine.service']
+        self.cmd = ['sudo', '/bin/systemctl']
+        self.proc = None
+
+    def run_cmd(self):
+        self.proc = run(self.cmd + self.service, stdout=PIPE, stderr=STDOUT,
+                        check=False, encoding="utf-8").stdout
+
+    def start(self):
+        self.cmd.append('start')
+        self.run_cmd()
+
+    def stop(self):
+        self.cmd.append('stop')
+        self.run_cmd()
+
+    def reload(self):
+        self.cmd.append('reload')
+        self.run_cmd()
+
+    def restart(self):
+        self.cmd.append('restart')
+        self.run_cmd()
+
+    def status(self):
+        self.cmd.append('is-active')
+        self.run_cmd()
+
+        return self.proc.replace('\n', '')
+
+
+class EngineControlSocket:
+    """
+    class for controlling ffplayout_engine over supervisord socket
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.server = ServerProxy(
+            f'http://{settings.SOCKET_USER}:{settings.SOCKET_PASS}'
+            f'@{settings.SOCKET_IP}:{settings.SOCKET_PORT}/RPC2')
+        self.process = None
+
+        try:
+            self.proc_list = self.server.supervisor.getAllProcessInfo()
+        except Exception:
+            self.proc_list = []
+
+    def get_process(self, engine):
+        self.engine = engine
+        self.process = None
+
+        for proc in self.proc_list:
+            if engine == proc.get('name'):
+                self.process = proc
+                break
+
+    def start(self):
+        if not self.process:
+            return self.add_process()
+        elif self.status() == 'STOPPED':
+            return self.server.supervisor.startProcess(self.engine)
+
+    def stop(self):
+        if self.process and self.process.get('statename') == 'RUNNING':
+            return self.server.supervisor.stopProcessGroup(self.engine)
+
+    def restart(self):
+        self.stop()
+        sleep(2)
+        self.start()
+
+    def reload(self):
+        if self.process:
+            return self.server.supervisor.signalProcess(self.engine,
+                                                        'SIGHUP')
+
+    def add_process(self):
+        return self.server.supervisor.addProcessGroup(self.engine)
+
+    def remove_process(self, engine):
+        return self.server.supervisor.removeProcessGroup(engine)
+
+    def status(self):
+        if self.process:
+            info = self.server.supervisor.getProcessInfo(self.engine)
+            return info.get('statename')
+
+
+class SystemControl:
+    """
+    controlling the ffplayout_engine over systemd services,
+    or over a socket connecting
+    """
+
+    def run_cmd(self, service, cmd):
+        if cmd == 'start':
+            service.start()
+            return 200
+        if cmd == 'stop':
+            service.stop()
+            return 200
+        if cmd == 'reload':
+            service.reload()
+            return 200
+        if cmd == 'restart':
+            service.restart()
+            return 200
+        if cmd == 'status':
+            return {"data": service.status()}
+
+        return 400
+
+    def systemd(self, cmd):
+        return self.run_cmd(EngineControlSystemD(), cmd)
+
+    def rpc_socket(self, cmd, engine):
+        sock = EngineControlSocket()
+        sock.get_process(engine)
+
+        return self.run_cmd(sock, cmd)
+
+    def run_service(self, cmd, channel=None):
+        if settings.MULTI_CHANNEL:
+            config = gui_config(channel)
+            return self.rpc_socket(cmd, config.get('engine_service'))
+
+        return self.systemd(cmd)
+
+
+class StatsHistory:
+    """
+    rolling history from numeric statistics, stored as ring buffer of
+    doubles: first the sample count, then per sample time and fields.
+    With a path, the buffer is a shared memory mapped file,
+    so all processes read the same history.
+    """
+    fields = ('cpu_usage', 'cpu_load', 'ram_used', 'swap_used',
+              'disk_used', 'net_speed_send', 'net_speed_recv')
+
+    def __init__(self, size, path=None):
+        self.size = size
+        self.width = len(self.fields) + 1
+        self.lock = Lock()
+        length = (size * self.width + 1) * 8
+
+        if path:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+            try:
+                if os.fstat(fd).st_size != length:
+                    # new file, or other history size
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, length)
+
+                self.buffer = mmap.mmap(fd, length)
+            finally:
+                os.close(fd)
+        else:
+            self.buffer = bytearray(length)
+
+        self.data = memoryview(self.buffer).cast('d')
+
+    def append(self, timestamp, values):
+        with self.lock:
+            count = int(self.data[0])
+            offset = (count % self.size) * self.width + 1
+            self.data[offset] = timestamp
+
+            for i, field in enumerate(self.fields, 1):
+                self.data[offset + i] = values.get(field, 0)
+
+            self.data[0] = count + 1
+
+    def query(self, start=None, end=None, fields=None):
+        """
+        return samples between start and end, oldest first
+        """
+        fields = [f for f in fields or self.fields if f in self.fields]
+        columns = {f: self.fields.index(f) + 1 for f in fields}
+
+        with self.lock:
+            count = int(self.data[0])
+            offsets = [(i % self.size) * self.width + 1
+                       for i in range(max(count - self.size, 0), count)]
+            offsets = [o for o in offsets
+                       if (start is None or self.data[o] >= start) and
+                       (end is None or self.data[o] <= end)]
+
+            return {
+                'time': [self.data[o] for o in offsets],
+                **{f: [self.data[o + c] for o in offsets]
+                   for f, c in columns.items()}
+            }
+
+
+class StatsSampler:
+    """
+    collect system statistics in background, in a fixed interval,
+    the last samples are stored in a ring buffer.
+    The shared history is written by the process, which holds the
+    history lock, the others take over, when it stops.
+    """
+    sampler = None
+    lock = Lock()
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.config = {}
+        self.samples = deque(maxlen=settings.STATS_BUFFER_SIZE)
+        self.ready = Event()
+        self.stop = Event()
+        self.thread = Thread(target=self.loop, daemon=True)
+        self.history = {
+            'second': StatsHistory(
+                int(settings.STATS_HISTORY_SECONDS / settings.STATS_INTERVAL),
+                os.path.join(settings.STATS_HISTORY_DIR,
+                             'stats-second.history')),
+            'minute': StatsHistory(
+                settings.STATS_HISTORY_MINUTES,
+                os.path.join(settings.STATS_HISTORY_DIR,
+                             'stats-minute.history'))
+        }
+        self.writer = None
+        self.minute = None
+        self.minute_values = []
+
+    @classmethod
+    def get(cls, config):
+        """
+        return running sampler, start it when is needed
+        """
+        with cls.lock:
+            if cls.sampler is None or cls.sampler.pid != os.getpid():
+                cls.sampler = cls()
+                cls.sampler.config = config
+                cls.sampler.thread.start()
+
+        cls.sampler.config = config
+        cls.sampler.ready.wait(1)
+
+        return cls.sampler
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def loop(self):
+        psutil.cpu_percent(interval=None)
+        last_time = monotonic()
+        last_net = psutil.net_io_counters(pernic=True)
+        next_time = last_time + 0.2
+
+        while not self.stop.wait(max(next_time - monotonic(), 0)):
+            now = monotonic()
+            net = psutil.net_io_counters(pernic=True)
+            elapsed = now - last_time
+            speed = {
+                nic: (
+                    int((count.bytes_sent - last_net[nic].bytes_sent) /
+                        elapsed),
+                    int((count.bytes_recv - last_net[nic].bytes_recv) /
+                        elapsed))
+                for nic, count in net.items() if nic in last_net
+            }
+            last_time = now
+            last_net = net
+            next_time = max(next_time + settings.STATS_INTERVAL, now)
+
+            self.samples.append(self.collect(speed))
+
+            if self.history_writer():
+                self.add_history(self.samples[-1])
+
+            self.ready.set()
+
+    def history_writer(self):
+        """
+        return True, when this process writes the shared history
+        """
+        if self.writer is None:
+            lock = open(os.path.join(settings.STATS_HISTORY_DIR,
+                                     'stats-history.lock'), 'w')
+
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.writer = lock
+            except OSError:
+                lock.close()
+
+        return self.writer is not None
+
+    def add_history(self, sample):
+        """
+        add sample to seconds history, and the average from every
+        full minute to minutes history
+        """
+        net_speed = sample['net_speed'].get(
+            self.config.get('net_interface'), (0, 0))
+        values = {
+            'cpu_usage': sample['cpu_usage'],
+            'cpu_load': sample['cpu_load'][0],
+            'ram_used': sample['ram'].used,
+            'swap_used': sample['swap'].used,
+            'disk_used': sample['disk'].used if sample['disk'] else 0,
+            'net_speed_send': net_speed[0],
+            'net_speed_recv': net_speed[1]
+        }
+        minute = int(sample['time'] // 60)
+
+        self.history['second'].append(sample['time'], values)
+
+        if self.minute is not None and minute != self.minute and \
+                self.minute_values:
+            self.history['minute'].append(self.minute * 60, {
+                field: sum(v[field] for v in self.minute_values) /
+                len(self.minute_values) for field in StatsHistory.fields})
+            self.minute_values = []
+
+        self.minute = minute
+        self.minute_values.append(values)
+
+    def collect(self, net_speed):
+        disk = None
+
+        if self.config.get('media_disk'):
+            try:
+                disk = psutil.disk_usage(self.config['media_disk'])
+            except OSError:
+                pass
+
+        return {
+            'time': time(),
+            'cpu_usage': psutil.cpu_percent(interval=None),
+            'cpu_load': psutil.getloadavg(),
+            'ram': psutil.virtual_memory(),
+            'swap': psutil.swap_memory(),
+            'disk': disk,
+            'net': psutil.net_io_counters(),
+            'net_speed': net_speed
+        }
+
+
+def start_stats_sampler():
+    """
+    start sampler with the server process,
+    so the history has no gaps until the first statistics request
+    """
+    try:
+        StatsSampler.get(gui_config(1))
+    except DatabaseError:
+        # database is not ready, sampler starts with first request
+        pass
+
+
+class SystemStats:
+    """
+    get system statistics, from latest sample of the background sampler
+    """
+    names = ('all', 'system', 'settings', 'cpu', 'ram', 'swap', 'disk',
+             'net', 'net_speed')
+
+    def __init__(self):
+        self.config = gui_config(1)
+        self.sampler = StatsSampler.get(self.config)
+        self.sample = self.sampler.latest()
+
+    def history(self, resolution='second', start=None, end=None,
+                fields=None):
+        if resolution in self.sampler.history:
+            return {'resolution': resolution,
+                    **self.sampler.history[resolution].query(
+                        start, end, fields)}
+
+        return None
+
+    def all(self):
+        if self.config:
+            return {
+                **self.system(), **self.settings(),
+                **self.cpu(), **self.ram(), **self.swap(),
+                **(self.disk() or {}), **self.net(),
+                **(self.net_speed() or {})
+            }
+
+    def system(self):
+        return {
+            'system': uname().system,
+            'node': uname().node,
+            'machine': uname().machine
+        }
+
+    def settings(self):
+        return {
+            'timezone': settings.TIME_ZONE,
+            'multi_channel': settings.MULTI_CHANNEL
+        }
+
+    def cpu(self):
+        load = self.sample['cpu_load']
+        return {
+            'cpu_usage': self.sample['cpu_usage'],
+            'cpu_load': [
+                '{:.2f}'.format(load[0]),
+                '{:.2f}'.format(load[1]),
+                '{:.2f}'.format(load[2])
+            ]
+        }
+
+    def ram(self):
+        mem = self.sample['ram']
+        return {
+            'ram_total': [mem.total, sizeof_fmt(mem.total)],
+            'ram_used': [mem.used, sizeof_fmt(mem.used)],
+            'ram_free': [mem.free, sizeof_fmt(mem.free)],
+            'ram_cached': [mem.cached, sizeof_fmt(mem.cached)]
+        }
+
+    def swap(self):
+        swap = self.sample['swap']
+        return {
+            'swap_total': [swap.total, sizeof_fmt(swap.total)],
+            'swap_used': [swap.used, sizeof_fmt(swap.used)],
+            'swap_free': [swap.free, sizeof_fmt(swap.free)]
+        }
+
+    def disk(self):
+        if self.sample['disk']:
+            root = self.sample['disk']
+            return {
+                'disk_total': [root.total, sizeof_fmt(root.total)],
+                'disk_used': [root.used, sizeof_fmt(root.used)],
+                'disk_free': [root.free, sizeof_fmt(root.free)]
+            }
+
+    def net(self):
+        net = self.sample['net']
+        return {
+            'net_send': [net.bytes_sent, sizeof_fmt(net.bytes_sent)],
+            'net_recv': [net.bytes_recv, sizeof_fmt(net.bytes_recv)],
+            'net_errin': net.errin,
+            'net_errout': net.errout
+        }
+
+    def net_speed(self):
+        if 'net_interface' not in self.config or \
+                not self.config['net_interface']:
+            return
+
+        if self.config['net_interface'] not in self.sample['net_speed']:
+            return {
+                'net_speed_send': 'no network interface set!',
+                'net_speed_recv': 'no network interface set!'
+            }
+
+        send_sec, recv_sec = \
+            self.sample['net_speed'][self.config['net_interface']]
+
+        return {
+            'net_speed_send': [send_sec, sizeof_fmt(send_sec)],
+            'net_speed_recv': [recv_sec, sizeof_fmt(recv_sec)]
+        }
+
+
+def get_video_duration(clip, timeout=None):
+    """
+    return video duration from container, mediainfo runs in its own process,
+    so it gets killed, when it hangs longer than timeout
+    """
+    output = run(['mediainfo', '--Inform=General;%Duration%', clip],
+                 stdout=PIPE, stderr=DEVNULL, timeout=timeout).stdout
+
+    try:
+        return float(output) / 1000
+    except ValueError:
+        return 0
+
+
+def evict_media_cache():
+    """
+    remove the least recently used entries, when cache is to big
+    """
+    overflow = MediaCache.objects.count() - settings.MEDIA_CACHE_SIZE
+
+    if overflow > 0:
+        old_entries = MediaCache.objects.order_by(
+            'last_used').values_list('id', flat=True)[:overflow]
+        MediaCache.objects.filter(id__in=list(old_entries)).delete()
+
+
+def probe_clips(clips):
+    """
+    parse clips parallel in a bounded thread pool,
+    clips which are not finished in time, get a duration of None
+    """
+    if not clips:
+        return {}
+
+    def probe(clip):
+        try:
+            return get_video_duration(clip, settings.MEDIA_PROBE_TIMEOUT)
+        except TimeoutExpired:
+            return None
+        except Exception:
+            # broken clip
+            return 0
+
+    with ThreadPoolExecutor(max_workers=min(
+            settings.MEDIA_PROBE_WORKERS, len(clips))) as executor:
+        return dict(zip(clips, executor.map(probe, clips)))
+
+
+def stat_clips(clips):
+    """
+    return size and mtime from existing clips,
+    stat calls run parallel, for network storage
+    """
+    def stat(clip):
+        try:
+            stat_ = os.stat(clip)
+            return clip, (stat_.st_size, stat_.st_mtime_ns)
+        except OSError:
+            return clip, None
+
+    if len(clips) < 2:
+        results = map(stat, clips)
+    else:
+        with ThreadPoolExecutor(
+                max_workers=settings.MEDIA_PROBE_WORKERS) as executor:
+            results = list(executor.map(stat, clips, chunksize=64))
+
+    return {clip: stat_ for clip, stat_ in results if stat_}
+
+
+def get_durations(clips, file_stats=None):
+    """
+    return durations from clips, read them from cache when file is unchanged,
+    otherwise parse clip and update cache
+    """
+    if file_stats is None:
+        file_stats = stat_clips(clips)
+
+    durations = {clip: 0 for clip in clips if clip not in file_stats}
+    file_stats = {clip: file_stats[clip] for clip in clips
+                  if clip in file_stats}
+
+    cached = {}
+    paths = list(file_stats)
+
+    # sqlite has a limit of variables per query
+    for i in range(0, len(paths), 500):
+        for entry in MediaCache.objects.filter(path__in=paths[i:i + 500]):
+            cached[entry.path] = entry
+
+    now = timezone.now()
+    used = []
+    changed = []
+    new = []
+
+    missing = []
+
+    for clip, (size, mtime_ns) in file_stats.items():
+        entry = cached.get(clip)
+
+        if entry and entry.size == size and entry.mtime_ns == mtime_ns:
+            durations[clip] = entry.duration
+            used.append(entry.id)
+        else:
+            missing.append(clip)
+
+    probed = probe_clips(missing)
+
+    for clip in missing:
+        size, mtime_ns = file_stats[clip]
+        entry = cached.get(clip)
+
+        if probed[clip] is None:
+            # clip hangs, try it again on next request
+            durations[clip] = 0
+            continue
+
+        durations[clip] = probed[clip]
+
+        if entry:
+            entry.size = size
+            entry.mtime_ns = mtime_ns
+            entry.duration = durations[clip]
+            entry.last_used = now
+            changed.append(entry)
+        else:
+            new.append(MediaCache(path=clip, size=size, mtime_ns=mtime_ns,
+                                  duration=durations[clip], last_used=now))
+
+    for i in range(0, len(used), 500):
+        MediaCache.objects.filter(id__in=used[i:i + 500]).update(
+            last_used=now)
+
+    if changed:
+        MediaCache.objects.bulk_update(
+            changed, ['size', 'mtime_ns', 'duration', 'last_used'],
+            batch_size=500)
+
+    if new:
+        MediaCache.objects.bulk_create(
+            new, batch_size=500, ignore_conflicts=True)
+        evict_media_cache()
+
+    return durations
+
+
+def time_to_sec(time_str):
+    """
+    convert time string hh:mm:ss to seconds
+    """
+    try:
+        hours, minutes, seconds = time_str.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+def validate_playlist(data, config):
+    """
+    check sources and durations from program entries,
+    and compare the playlist length with the configured length
+    """
+    program = data.get('program') if isinstance(data, dict) else None
+
+    if not isinstance(program, list):
+        return {'valid': False, 'errors': [
+            {'index': None, 'type': 'format', 'detail': 'No program'}]}
+
+    errors = []
+    sources = {clip.get('source') for clip in program
+               if isinstance(clip, dict) and isinstance(clip.get('source'),
+                                                        str)}
+    # streams and lavfi sources can not be checked
+    files = [src for src in sources if src.startswith('/')]
+    file_stats = stat_clips(files)
+    durations = get_durations(files, file_stats)
+
+    playlist = config.get('playlist', {})
+    day_start = time_to_sec(playlist.get('day_start')) or 0
+    target = time_to_sec(playlist.get('length'))
+    tolerance = settings.PLAYLIST_DURATION_TOLERANCE
+    begin = day_start
+
+    for index, clip in enumerate(program):
+        try:
+            source = clip['source']
+            in_ = float(clip['in'])
+            out = float(clip['out'])
+            duration = float(clip['duration'])
+        except (KeyError, TypeError, ValueError):
+            errors.append({'index': index, 'type': 'format',
+                           'detail': 'Invalid clip'})
+            continue
+
+        if source in file_stats:
+            real_duration = durations.get(source)
+
+            if real_duration and abs(real_duration - duration) > tolerance:
+                errors.append({
+                    'index': index, 'type': 'duration', 'source': source,
+                    'detail': f'Duration is {real_duration}, not {duration}'})
+        elif source in files:
+            errors.append({'index': index, 'type': 'missing',
+                           'source': source, 'detail': 'Source not exists'})
+
+        if not 0 <= in_ < out or out > duration + tolerance:
+            errors.append({'index': index, 'type': 'range', 'source': source,
+                           'detail': f'Invalid in {in_} or out {out}'})
+
+        declared = clip.get('begin')
+
+        if isinstance(declared, (int, float)) and \
+                abs(declared - begin) > tolerance:
+            errors.append({
+                'index': index, 'type': 'gap' if declared > begin
+                else 'overlap', 'source': source,
+                'detail': f'Begin is {declared}, expected {begin}'})
+
+        begin += out - in_
+
+    length = begin - day_start
+    result = {'length': length, 'target': target, 'day_start': day_start}
+
+    if target is not None:
+        result['difference'] = length - target
+
+        if length + tolerance < target:
+            errors.append({'index': None, 'type': 'gap',
+                           'detail': f'Playlist is {target - length} '
+                           'seconds to short'})
+        elif length - tolerance > target:
+            errors.append({'index': None, 'type': 'overlap',
+                           'detail': f'Playlist is {length - target} '
+                           'seconds to long'})
+
+    result['valid'] = not errors
+    result['errors'] = errors
+
+    return result
+
+
+def folder_clips(config, folder):
+    """
+    return sorted clips with duration from folder and sub folders,
+    durations comes from media index or duration cache
+    """
+    _, path = get_path(folder, config['storage']['path'])
+    path = path.rstrip('/')
+    extensions = config['storage']['extensions']
+    clips = None
+
+    if settings.MEDIA_INDEX:
+        MediaIndexer.run(config)
+        clips = dict(MediaIndex.objects.filter(
+            Q(folder=path) | Q(folder__startswith=path + '/'),
+            extension__in=extensions, duration__isnull=False).values_list(
+                'path', 'duration'))
+
+    if not clips:
+        # index is not ready
+        clips = get_durations([
+            os.path.join(root, file) for root, _, files in os.walk(path)
+            for file in files if os.path.splitext(file)[1] in extensions])
+
+    return [(clip, clips[clip]) for clip in natsorted(clips) if clips[clip]]
+
+
+def clip_order(clips, shuffle, rand):
+    """
+    endless clip iterator, every clip is played once per round
+    """
+    while True:
+        order = list(clips)
+
+        if shuffle:
+            rand.shuffle(order)
+
+        yield from order
+
+
+def generate_playlists(channel, date_from, date_to, folders,
+                       mode='rotation', length=None, seed=None):
+    """
+    fill playlists from date range with clips from folders,
+    folders take turns, clips in folder are played sorted or shuffled,
+    and continue on the next day
+    """
+    config = read_yaml(channel)
+
+    if not config:
+        return None
+
+    target = time_to_sec(length or config['playlist'].get('length')) or 86400
+    rand = Random(seed)
+    pools = [clips for clips in (folder_clips(config, folder)
+                                 for folder in folders) if clips]
+
+    if not pools:
+        return []
+
+    folder_turn = cycle([clip_order(clips, mode == 'shuffle', rand)
+                         for clips in pools])
+    name = gui_config(channel).get('channel') or 'Channel 1'
+    playlists = []
+
+    for day in range((date_to - date_from).days + 1):
+        program = []
+        total = 0
+
+        while target - total > 0.001:
+            source, duration = next(next(folder_turn))
+            out = min(duration, target - total)
+            program.append({'in': 0, 'out': out, 'duration': duration,
+                            'source': source})
+            total += out
+
+        playlists.append({
+            'channel': name,
+            'date': (date_from + timedelta(days=day)).strftime('%Y-%m-%d'),
+            'program': program
+        })
+
+    return playlists
+
+
+def get_path(input_, media_folder):
+    """
+    return path and prevent breaking out of media root
+    """
+    media_root_list = media_folder.strip('/').split('/')
+    media_root_list.pop()
+    media_root = '/' + '/'.join(media_root_list)
+
+    if input_:
+        input_ = os.path.abspath(os.path.join(media_root, input_.strip('/')))
+
+    if not input_.startswith(media_folder):
+        input_ = os.path.join(media_folder, input_.strip('/'))
+
+    return media_root, input_
+
+
+def scan_media_path(extensions, config, _dir=''):
+    """
+    return relative root, sorted folders and sorted media files,
+    without parsing the files
+    """
+    media_folder = config['storage']['path']
+    extensions = extensions.split(',')
+    playout_extensions = config['storage']['extensions']
+    gui_extensions = [x for x in extensions if x not in playout_extensions]
+    media_root, search_dir = get_path(_dir, media_folder)
+    root = search_dir.rstrip('/')
+    dirs = []
+    files = []
+
+    try:
+        entries = list(os.scandir(search_dir))
+    except OSError:
+        return None
+
+    for entry in entries:
+        if entry.is_dir():
+            dirs.append(entry.name)
+            continue
+
+        ext = os.path.splitext(entry.name)[1]
+        if ext in playout_extensions:
+            files.append((entry.name, os.path.join(root, entry.name)))
+        elif ext in gui_extensions:
+            files.append((entry.name, None))
+
+    dirs = natsorted(dirs)
+
+    if root.strip('/') != media_folder.strip('/') or not dirs:
+        dirs.insert(0, '..')
+
+    root = re.sub(r'^{}'.format(media_root), '', root).strip('/')
+
+    return root, dirs, natsorted(files, key=lambda x: x[0])
+
+
+def media_entries(files):
+    """
+    add durations to scanned media files,
+    from media index or media cache
+    """
+    clips = [clip for _, clip in files if clip]
+    durations = indexed_durations(clips) if settings.MEDIA_INDEX else {}
+    durations.update(
+        get_durations([clip for clip in clips if clip not in durations]))
+
+    return [{'file': file, 'duration': durations[clip] if clip else ''}
+            for file, clip in files]
+
+
+def get_media_path(extensions, channel, _dir='', offset=0, limit=None):
+    config = read_yaml(channel)
+
+    if config:
+        MediaIndexer.run(config)
+        scan = scan_media_path(extensions, config, _dir)
+
+        if scan:
+            root, dirs, files = scan
+            end = len(files) if limit is None else offset + limit
+            next_offset = end if end < len(files) else None
+
+            return {
+                'tree': [root, dirs, media_entries(files[offset:end])],
+                'total': len(files),
+                'next': next_offset
+            }
+
+    return {'tree': []}
+
+
+def stream_media_path(extensions, channel, _dir='', offset=0, limit=None):
+    """
+    generator for a newline delimited json stream,
+    first line is the folder, every following line is a file
+    """
+    config = read_yaml(channel)
+
+    if config:
+        MediaIndexer.run(config)
+
+    scan = scan_media_path(extensions, config, _dir) if config else None
+
+    if not scan:
+        yield json.dumps({'tree': []}) + '\n'
+        return
+
+    root, dirs, files = scan
+    end = len(files) if limit is None else offset + limit
+    files = files[offset:end]
+    chunk = settings.MEDIA_PROBE_WORKERS * 4
+
+    yield json.dumps({'root': root, 'dirs': dirs,
+                      'total': len(scan[2])}) + '\n'
+
+    for i in range(0, len(files), chunk):
+        for entry in media_entries(files[i:i + chunk]):
+            yield json.dumps(entry) + '\n'
+
+
+UPLOAD_HASHES = {}
+UPLOAD_LOCK = Lock()
+
+
+def upload_part(upload):
     """
-    return path and prevent breaking out of media root
+    return path from hidden part file, in target folder
     """
-    media_root_list = media_folder.strip('/').split('/')
-    media_root_list.pop()
-    media_root = '/' + '/'.join(media_root_list)
+    folder, name = os.path.split(upload.path)
 
-    if input_:
-        input_ = os.path.abspath(os.path.join(media_root, input_.strip('/')))
+    return os.path.join(folder, f'.{name}.{upload.id.hex}.part')
 
-    if not input_.startswith(media_folder):
-        input_ = os.path.join(media_folder, input_.strip('/'))
 
-    return media_root, input_
+def remove_upload(upload):
+    with UPLOAD_LOCK:
+        UPLOAD_HASHES.pop(upload.id, None)
+
+    if os.path.isfile(upload_part(upload)):
+        os.remove(upload_part(upload))
+
+    upload.delete()
+
+
+def parse_range(header, size):
+    """
+    return start and end from single byte range header,
+    None when header is missing or has many ranges,
+    False when range is not satisfiable
+    """
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header or '')
+
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    if match.group(1) == '':
+        # suffix range, last bytes from file
+        length = int(match.group(2))
+
+        if not length or not size:
+            return False
+
+        return max(size - length, 0), size - 1
+
+    start = int(match.group(1))
+    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+
+    if start >= size or end < start:
+        return False
+
+    return start, end
 
 
-def get_media_path(extensions, channel, _dir=''):
+class RangeFile:
+    """
+    file object, which reads only a byte range,
+    fileno and position stay usable for sendfile from the WSGI server
+    """
+
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def storage_path(root, path_):
+    """
+    return absolute path from storage path like /media/folder/clip.mp4,
+    or None when path is outside from storage, symlinks are not resolved,
+    so operations act on the link itself
+    """
+    real_root = os.path.realpath(root)
+    path_ = os.path.abspath(
+        os.path.join(root, *path_.strip('/').split('/')[1:]))
+    real_path = os.path.realpath(path_)
+
+    if real_path == real_root or real_path.startswith(real_root + os.sep):
+        return path_
+
+    return None
+
+
+def create_upload(channel, path_, filename, size, checksum=''):
+    """
+    register resumable upload and create empty part file,
+    return None when target folder is not in storage
+    """
     config = read_yaml(channel)
 
-    if config:
-        media_folder = config['storage']['path']
-        extensions = extensions.split(',')
-        playout_extensions = config['storage']['extensions']
-        gui_extensions = [x for x in extensions if x not in playout_extensions]
-        media_root, search_dir = get_path(_dir, media_folder)
+    if not config:
+        return None
+
+    expired = timezone.now() - timedelta(seconds=settings.UPLOAD_EXPIRE)
+
+    for upload in Upload.objects.filter(updated__lt=expired):
+        remove_upload(upload)
+
+    folder = storage_path(config['storage']['path'], path_)
+    filename = os.path.basename(filename)
+
+    if not filename or not folder or not os.path.isdir(folder):
+        return None
+
+    upload = Upload.objects.create(
+        channel=channel, path=os.path.join(folder, filename), size=size,
+        checksum=checksum.lower())
+    open(upload_part(upload), 'wb').close()
+
+    return upload
+
+
+def upload_hasher(upload, part):
+    """
+    return sha256 from part file until offset,
+    hash is kept in memory between requests and only rebuild,
+    when the previous chunk came to another process
+    """
+    with UPLOAD_LOCK:
+        state = UPLOAD_HASHES.pop(upload.id, None)
+
+    if state and state[0] == upload.offset:
+        return state[1]
+
+    hasher = sha256()
+    remaining = upload.offset
+    part.seek(0)
 
-        for root, dirs, files in os.walk(search_dir, topdown=True):
-            root = root.rstrip('/')
-            media_files = []
+    while remaining:
+        chunk = part.read(min(settings.UPLOAD_CHUNK_SIZE, remaining))
+
+        if not chunk:
+            break
+
+        hasher.update(chunk)
+        remaining -= len(chunk)
+
+    return hasher
+
+
+def write_upload(upload, stream, offset):
+    """
+    write request body at offset to part file,
+    finished uploads are verified and renamed to target,
+    return http status
+    """
+    if offset != upload.offset:
+        return 409
+
+    part_path = upload_part(upload)
+
+    try:
+        part = open(part_path, 'r+b')
+    except OSError:
+        return 404
+
+    with part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # other request writes to the same upload
+            return 423
+
+        upload.refresh_from_db()
+
+        if offset != upload.offset:
+            return 409
+
+        hasher = upload_hasher(upload, part) if upload.checksum else None
+        # data after offset comes from interrupted request
+        part.truncate(offset)
+        part.seek(offset)
+
+        try:
+            while stream and upload.offset < upload.size:
+                chunk = stream.read(min(settings.UPLOAD_CHUNK_SIZE,
+                                        upload.size - upload.offset))
+
+                if not chunk:
+                    break
+
+                part.write(chunk)
+
+                if hasher:
+                    hasher.update(chunk)
+
+                upload.offset += len(chunk)
+        except OSError:
+            # client is gone, offset keeps what we have
+            pass
+        finally:
+            part.flush()
+            Upload.objects.filter(id=upload.id).update(
+                offset=upload.offset, updated=timezone.now())
+
+            if hasher:
+                with UPLOAD_LOCK:
+                    UPLOAD_HASHES[upload.id] = (upload.offset, hasher)
+
+        if upload.offset < upload.size:
+            return 204
+
+        os.fsync(part.fileno())
+
+        if hasher and hasher.hexdigest() != upload.checksum:
+            remove_upload(upload)
+            return 460
+
+        os.replace(part_path, upload.path)
+
+    with UPLOAD_LOCK:
+        UPLOAD_HASHES.pop(upload.id, None)
+
+    upload.delete()
+
+    return 204
+
+
+def indexed_durations(clips):
+    """
+    return durations from clips, which are in media index
+    """
+    durations = {}
+
+    for i in range(0, len(clips), 500):
+        durations.update(MediaIndex.objects.filter(
+            path__in=clips[i:i + 500], duration__isnull=False).values_list(
+                'path', 'duration'))
+
+    return durations
+
+
+def update_media_index(root, extensions, paths):
+    """
+    add or update files in media index, remove files which not exists
+    """
+    file_stats = {}
+    removed = []
+
+    for path in paths:
+        try:
+            file_stats[path] = os.stat(path)
+        except OSError:
+            removed.append(path)
+
+    durations = get_durations([path for path in file_stats
+                               if os.path.splitext(path)[1] in extensions])
+    entries = [MediaIndex(
+        root=root, folder=os.path.dirname(path),
+        name=os.path.basename(path), path=path,
+        extension=os.path.splitext(path)[1], size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns, duration=durations.get(path))
+        for path, stat in file_stats.items()]
+
+    with transaction.atomic():
+        remove_media_index(removed + list(file_stats))
+        MediaIndex.objects.bulk_create(entries, batch_size=500)
+
+
+def remove_media_index(paths=None, folder=None):
+    """
+    remove files, or a whole folder from media index
+    """
+    paths = paths or []
+
+    for i in range(0, len(paths), 500):
+        MediaIndex.objects.filter(path__in=paths[i:i + 500]).delete()
+
+    if folder:
+        folder = folder.rstrip('/')
+        MediaIndex.objects.filter(folder=folder).delete()
+        MediaIndex.objects.filter(folder__startswith=folder + '/').delete()
+
+
+class MediaIndexer:
+    """
+    keep media index from storage path up to date,
+    changes comes from inotify, with periodic rescans as fallback.
+    Only one process per storage path is indexing, the others wait
+    on the lock file.
+    """
+    indexers = {}
+    lock = Lock()
+
+    def __init__(self, root, extensions):
+        self.root = root.rstrip('/')
+        self.extensions = extensions
+        self.stop = Event()
+        self.lock_file = os.path.join(
+            settings.BASE_DIR, 'dbs', 'media-index-{}.lock'.format(
+                sha1(self.root.encode()).hexdigest()[:12]))
+        self.thread = Thread(target=self.loop, daemon=True)
+
+    @classmethod
+    def run(cls, config):
+        """
+        start indexer from storage path, when is not running
+        """
+        if not settings.MEDIA_INDEX:
+            return None
+
+        root = config['storage']['path'].rstrip('/')
+
+        with cls.lock:
+            if root not in cls.indexers:
+                cls.indexers[root] = cls(root,
+                                         config['storage']['extensions'])
+                cls.indexers[root].thread.start()
+
+        return cls.indexers[root]
+
+    def loop(self):
+        with open(self.lock_file, 'w') as lock:
+            while not self.stop.is_set():
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    # other process is indexing, take over when it stops
+                    self.stop.wait(settings.MEDIA_INDEX_LOCK_RETRY)
+
+            while not self.stop.is_set():
+                try:
+                    self.scan()
+                    self.watch()
+                except (DatabaseError, OSError):
+                    # storage or database is not available, try again later
+                    self.stop.wait(60)
+                finally:
+                    connection.close()
+
+    def scan(self, folder=None):
+        """
+        compare storage with index and update only changed files
+        """
+        folder = (folder or self.root).rstrip('/')
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 MediaIndex.objects.filter(root=self.root).filter(
+                     Q(folder=folder) |
+                     Q(folder__startswith=folder + '/')).values_list(
+                         'path', 'size', 'mtime_ns')}
+        changed = []
+
+        for root, _, files in os.walk(folder):
+            if self.stop.is_set():
+                return
 
             for file in files:
-                ext = os.path.splitext(file)[1]
-                if ext in playout_extensions:
-                    duration = get_video_duration(os.path.join(root, file))
-                    media_files.append({'file': file, 'duration': duration})
-                elif ext in gui_extensions:
-                    media_files.append({'file': file, 'duration': ''})
+                path = os.path.join(root, file)
+
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                if known.pop(path, None) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append(path)
+
+            if len(changed) >= 500:
+                update_media_index(self.root, self.extensions, changed)
+                changed = []
+
+        update_media_index(self.root, self.extensions, changed)
+        remove_media_index(list(known))
+
+    def watch(self):
+        """
+        update index from inotify events, until next rescan
+        """
+        deadline = monotonic() + settings.MEDIA_INDEX_RESCAN
+
+        if INotify is None:
+            self.stop.wait(settings.MEDIA_INDEX_RESCAN)
+            return
+
+        mask = flags.CREATE | flags.DELETE | flags.CLOSE_WRITE | \
+            flags.MOVED_FROM | flags.MOVED_TO
+        watches = {}
+
+        with INotify() as inotify:
+            def add_watches(folder):
+                for root, _, _ in os.walk(folder):
+                    try:
+                        watches[inotify.add_watch(root, mask)] = root
+                    except OSError:
+                        pass
+
+            add_watches(self.root)
+
+            while not self.stop.is_set() and monotonic() < deadline:
+                changed = set()
+                removed = set()
+
+                for event in inotify.read(timeout=1000, read_delay=100):
+                    if event.mask & flags.Q_OVERFLOW:
+                        # events are lost, do a full rescan
+                        return
 
-            dirs = natsorted(dirs)
+                    if event.mask & flags.IGNORED:
+                        watches.pop(event.wd, None)
 
-            if root.strip('/') != media_folder.strip('/') or not dirs:
-                dirs.insert(0, '..')
+                    if event.wd not in watches or not event.name:
+                        continue
 
-            root = re.sub(r'^{}'.format(media_root), '', root).strip('/')
+                    path = os.path.join(watches[event.wd], event.name)
 
-            return [root, dirs,
-                    natsorted(media_files, key=lambda x: x['file'])]
-    return []
+                    if event.mask & flags.ISDIR:
+                        if event.mask & (flags.CREATE | flags.MOVED_TO):
+                            add_watches(path)
+                            self.scan(path)
+                        elif event.mask & (flags.DELETE | flags.MOVED_FROM):
+                            remove_media_index(folder=path)
+                    elif event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO):
+                        changed.add(path)
+                        removed.discard(path)
+                    elif event.mask & (flags.DELETE | flags.MOVED_FROM):
+                        removed.add(path)
+                        changed.discard(path)
+
+                if changed or removed:
+                    update_media_index(self.root, self.extensions,
+                                       list(changed | removed))
+
+
+class MediaSearchIndex:
+    """
+    in memory search over media index, sorted names for prefix search,
+    trigram posting lists for substring search and the natural sort rank
+    from every path, for returning the first matches in order
+    """
+    indexes = {}
+    lock = Lock()
+
+    def __init__(self, root):
+        self.root = root
+        self.version = None
+        self.entries = []
+        self.names = []
+        self.trigrams = {}
+        self.ranks = array('I')
+
+    @classmethod
+    def get(cls, root):
+        root = root.rstrip('/')
+
+        with cls.lock:
+            if root not in cls.indexes:
+                cls.indexes[root] = cls(root)
+
+            cls.indexes[root].refresh()
+
+        return cls.indexes[root]
+
+    def refresh(self):
+        """
+        rebuild search index, when media index has changed
+        """
+        query = MediaIndex.objects.filter(root=self.root)
+        version = query.aggregate(count=Count('id'), updated=Max('updated'))
+
+        if version == self.version:
+            return
+
+        self.entries = list(query.values_list(
+            'name', 'path', 'duration', 'extension'))
+        self.names = sorted((entry[0].lower(), i)
+                            for i, entry in enumerate(self.entries))
+        self.trigrams = {}
+
+        for i, entry in enumerate(self.entries):
+            name = entry[0].lower()
+
+            for gram in {name[j:j + 3] for j in range(len(name) - 2)}:
+                self.trigrams.setdefault(gram, array('I')).append(i)
+
+        self.ranks = array('I', [0]) * len(self.entries)
+
+        for rank, i in enumerate(natsorted(
+                range(len(self.entries)), key=lambda i: self.entries[i][1])):
+            self.ranks[i] = rank
+
+        self.version = version
+
+    def prefix(self, query):
+        start = bisect_left(self.names, (query,))
+
+        for name, i in self.names[start:]:
+            if not name.startswith(query):
+                break
+            yield i
+
+    def substring(self, query):
+        if len(query) < 3:
+            candidates = range(len(self.entries))
+        else:
+            candidates = min(
+                (self.trigrams.get(query[j:j + 3], ())
+                 for j in range(len(query) - 2)), key=len)
+
+        for i in candidates:
+            if query in self.entries[i][0].lower():
+                yield i
+
+    def search(self, query, mode='substring', extensions=None, limit=100):
+        """
+        return matching files, ready to use as playlist source
+        """
+        query = query.lower()
+        matches = self.prefix(query) if mode == 'prefix' \
+            else self.substring(query)
+
+        if extensions:
+            matches = (i for i in matches
+                       if self.entries[i][3] in extensions)
+
+        return [{'file': self.entries[i][0], 'source': self.entries[i][1],
+                 'duration': self.entries[i][2]}
+                for i in nsmallest(limit, matches, key=self.ranks.__getitem__)]
+
+
+def search_media(query, channel, mode='substring', extensions=None,
+                 limit=100):
+    config = read_yaml(channel)
+
+    if config:
+        MediaIndexer.run(config)
+        search_index = MediaSearchIndex.get(config['storage']['path'])
+
+        return search_index.search(query, mode, extensions, limit)
+
+    return None
+
+
+def media_info(clip):
+    """
+    return duration and information from first video and audio stream
+    """
+    info = {'duration': 0, 'format': None, 'video': None, 'audio': None}
+
+    for track in MediaInfo.parse(clip).tracks:
+        data = track.to_data()
+
+        if track.track_type == 'General':
+            info['duration'] = float(data.get('duration', 0)) / 1000
+            info['format'] = data.get('format')
+        elif track.track_type == 'Video' and not info['video']:
+            info['video'] = {'codec': data.get('format'),
+                             'width': data.get('width'),
+                             'height': data.get('height'),
+                             'frame_rate': data.get('frame_rate')}
+        elif track.track_type == 'Audio' and not info['audio']:
+            info['audio'] = {'codec': data.get('format'),
+                             'channels': data.get('channel_s'),
+                             'sample_rate': data.get('sampling_rate')}
+
+    return info
+
+
+def move_media_cache(old, new, copy=False):
+    """
+    keep cached durations from renamed or copied files and folders
+    """
+    entries = list(MediaCache.objects.filter(
+        Q(path=old) | Q(path__startswith=old + '/')))
+
+    for entry in entries:
+        entry.path = new + entry.path[len(old):]
+        MediaCache.objects.filter(path=entry.path).delete()
+
+        if copy:
+            entry.id = None
+            entry.save()
+        else:
+            entry.save(update_fields=['path'])
+
+
+def process_media(job):
+    """
+    probe new and changed files, update duration cache and media index,
+    params are:
+        paths: changed or removed files
+        folders: removed folders
+        moved: renamed files or folders, as [old, new]
+        copied: copied files or folders, as [source, copy]
+        scan: new folders
+    """
+    config = read_yaml(job.channel)
+    params = json.loads(job.params)
+    root = config['storage']['path'].rstrip('/')
+    extensions = config['storage']['extensions']
+    paths = params.get('paths', [])
+    index_paths = list(paths)
+    scan = list(params.get('scan', []))
+    files = {}
+
+    for old, new in params.get('moved', []):
+        # content is the same, cached duration moves with the file
+        move_media_cache(old, new)
+
+        if os.path.isdir(new):
+            remove_media_index(folder=old)
+            scan.append(new)
+        else:
+            index_paths += [old, new]
+
+    for source, copy in params.get('copied', []):
+        move_media_cache(source, copy, copy=True)
+
+        if os.path.isdir(copy):
+            scan.append(copy)
+        else:
+            index_paths.append(copy)
+
+    for folder in params.get('folders', []):
+        MediaCache.objects.filter(
+            path__startswith=folder.rstrip('/') + '/').delete()
+        remove_media_index(folder=folder)
+
+    for done, path in enumerate(paths):
+        job_progress(job, done, len(paths))
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            MediaCache.objects.filter(path=path).delete()
+            continue
+
+        if os.path.splitext(path)[1] not in extensions:
+            continue
+
+        try:
+            files[path] = JobWorker.call(job, media_info, path)
+        except Exception:
+            # broken clip
+            files[path] = {'duration': 0}
+
+        MediaCache.objects.update_or_create(path=path, defaults={
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'duration': files[path]['duration'],
+            'last_used': timezone.now()})
+
+    if settings.MEDIA_INDEX:
+        update_media_index(root, extensions, index_paths)
+        indexer = MediaIndexer.run(config)
+
+        for folder in scan:
+            indexer.scan(folder)
+
+    return {'files': files}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_progress(job, done, total):
+    """
+    save progress, at most every second,
+    raise JobCancelled when job should stop
+    """
+    now = monotonic()
+
+    if done < total and now - getattr(job, 'reported', 0) < 1:
+        return
+
+    job.reported = now
+    Job.objects.filter(id=job.id).update(done=done, total=total,
+                                         updated=timezone.now())
+
+    if Job.objects.filter(id=job.id, cancel=True).exists():
+        raise JobCancelled()
+
+
+def job_paths(job, root):
+    """
+    return confined absolute paths from job params
+    """
+    return {path_: storage_path(root, path_)
+            for path_ in json.loads(job.params).get('paths', [])}
+
+
+def delete_files(job):
+    """
+    delete files and folders recursive, file by file for progress
+    """
+    root = read_yaml(job.channel)['storage']['path']
+    entries = []
+    results = {}
+    media = {'paths': [], 'folders': []}
+
+    for path_, full_path in job_paths(job, root).items():
+        if not full_path or full_path == os.path.abspath(root):
+            results[path_] = 'Path is not allowed'
+        elif os.path.isdir(full_path) and not os.path.islink(full_path):
+            for folder, dirs, files in JobWorker.call(
+                    job, list, os.walk(full_path, topdown=False)):
+                entries += [(os.path.join(folder, f), False) for f in files]
+                entries += [(os.path.join(folder, d), True) for d in dirs]
+
+            entries.append((full_path, True))
+            media['folders'].append(full_path)
+        elif os.path.lexists(full_path):
+            entries.append((full_path, False))
+            media['paths'].append(full_path)
+        else:
+            results[path_] = 'Not found'
+
+    try:
+        for done, (entry, is_dir) in enumerate(entries):
+            job_progress(job, done, len(entries))
+
+            try:
+                if is_dir and not os.path.islink(entry):
+                    JobWorker.call(job, os.rmdir, entry)
+                else:
+                    JobWorker.call(job, os.remove, entry)
+            except OSError as error:
+                results[entry] = error.strerror
+
+        job_progress(job, len(entries), len(entries))
+    finally:
+        JobWorker.submit('media', job.channel, media)
+
+    return {'errors': results}
+
+
+def transfer_files(job):
+    """
+    move or copy files and folders to target folder
+    """
+    root = read_yaml(job.channel)['storage']['path']
+    target = storage_path(root, json.loads(job.params).get('target', ''))
+
+    if not target or not os.path.isdir(target):
+        raise ValueError('Target folder not exists')
+
+    copy = job.kind == 'copy'
+    pairs = []
+    results = {}
+
+    for path_, full_path in job_paths(job, root).items():
+        new_path = os.path.join(target, os.path.basename(full_path or ''))
+
+        if not full_path or not os.path.exists(full_path):
+            results[path_] = 'Not found'
+        elif os.path.exists(new_path):
+            results[path_] = 'Target exists'
+        elif new_path == full_path or \
+                new_path.startswith(full_path + os.sep):
+            results[path_] = 'Target is inside source'
+        else:
+            pairs.append((full_path, new_path))
+
+    done_pairs = []
+    done = 0
+
+    def copy_file(source, new_path):
+        # folders are copied file by file, progress stays at current pair
+        job_progress(job, done, len(pairs))
+        JobWorker.call(job, shutil.copy2, source, new_path)
+
+    try:
+        for done, (source, new_path) in enumerate(pairs):
+            job_progress(job, done, len(pairs))
+
+            try:
+                if copy and os.path.isdir(source):
+                    copy_folder(source, new_path, copy_file)
+                elif copy:
+                    JobWorker.call(job, shutil.copy2, source, new_path)
+                else:
+                    # rename on same file system, copy and delete otherwise
+                    JobWorker.call(job, shutil.move, source, new_path)
+
+                done_pairs.append([source, new_path])
+            except (OSError, shutil.Error) as error:
+                results[source] = str(error)
+
+        job_progress(job, len(pairs), len(pairs))
+    finally:
+        JobWorker.submit('media', job.channel,
+                         {'copied' if copy else 'moved': done_pairs})
+
+    return {'errors': results}
+
+
+def copy_folder(source, target, copy_file):
+    """
+    copy folder file by file, with copy_file(source, target)
+    """
+    for root, _, files in os.walk(source):
+        folder = os.path.join(target, os.path.relpath(root, source))
+        os.makedirs(folder, exist_ok=True)
+
+        for file in files:
+            copy_file(os.path.join(root, file), os.path.join(folder, file))
+
+
+def rename_files(job):
+    """
+    rename many files, renames are [old path, new name]
+    """
+    root = read_yaml(job.channel)['storage']['path']
+    renames = json.loads(job.params).get('renames', [])
+    results = {}
+    moved = []
+
+    try:
+        for done, (path_, name) in enumerate(renames):
+            job_progress(job, done, len(renames))
+            old = storage_path(root, path_)
+            new = os.path.join(os.path.dirname(old or ''),
+                               os.path.basename(name))
+
+            if not old or not os.path.lexists(old) or \
+                    not os.path.basename(name):
+                results[path_] = 'Not found'
+            elif os.path.lexists(new):
+                results[path_] = 'Target exists'
+            else:
+                try:
+                    JobWorker.call(job, os.rename, old, new)
+                    moved.append([old, new])
+                except OSError as error:
+                    results[path_] = error.strerror
+
+        job_progress(job, len(renames), len(renames))
+    finally:
+        JobWorker.submit('media', job.channel, {'moved': moved})
+
+    return {'errors': results}
+
+
+def batch_file_operations(channel, operations):
+    """
+    run delete, move, rename and mkdir operations with one config lookup,
+    folder deletes and moves to other file systems go to background jobs,
+    return result per operation
+    """
+    config = read_yaml(channel)
+
+    if not config:
+        return None
+
+    root = config['storage']['path']
+    abs_root = os.path.abspath(root)
+    results = []
+    media = {'paths': [], 'moved': [], 'scan': []}
+    jobs = {'delete': [], 'move': {}}
+
+    for operation in operations:
+        op = operation.get('op') if isinstance(operation, dict) else None
+        path_ = operation.get('path', '') if op else ''
+        full_path = storage_path(root, path_) if path_ else None
+        name = os.path.basename(str(operation.get('name', ''))) \
+            if op else ''
+        result = {'op': op, 'path': path_, 'status': 'done'}
+        results.append(result)
+
+        try:
+            if not full_path or (full_path == abs_root and op != 'mkdir'):
+                raise ValueError('Path is not allowed')
+
+            if op == 'mkdir':
+                if not name:
+                    raise ValueError('Name is missing')
+
+                os.mkdir(os.path.join(full_path, name))
+                media['scan'].append(os.path.join(full_path, name))
+            elif not os.path.lexists(full_path):
+                raise ValueError('Not found')
+            elif op == 'delete':
+                if os.path.isdir(full_path) and \
+                        not os.path.islink(full_path):
+                    jobs['delete'].append((path_, result))
+                else:
+                    os.remove(full_path)
+                    media['paths'].append(full_path)
+            elif op in ['move', 'rename']:
+                if op == 'rename':
+                    target = os.path.dirname(full_path)
+                else:
+                    target = storage_path(root, operation.get('target', ''))
+                    name = os.path.basename(full_path)
+
+                if not name or not target or not os.path.isdir(target):
+                    raise ValueError('Target not exists')
+
+                new_path = os.path.join(target, name)
+
+                if os.path.lexists(new_path):
+                    raise ValueError('Target exists')
+
+                try:
+                    os.rename(full_path, new_path)
+                    media['moved'].append([full_path, new_path])
+                except OSError as error:
+                    if error.errno != errno.EXDEV:
+                        raise
+
+                    # other file system, data needs to be copied
+                    jobs['move'].setdefault(operation['target'], []).append(
+                        (path_, result))
+            else:
+                raise ValueError(f'Unknown operation {op}')
+        except (OSError, ValueError) as error:
+            result['status'] = 'error'
+            result['detail'] = getattr(error, 'strerror', None) or str(error)
+
+    if jobs['delete']:
+        job = JobWorker.submit('delete', int(channel), {
+            'paths': [path_ for path_, _ in jobs['delete']]})
+
+        for _, result in jobs['delete']:
+            result.update(status='queued', job=job.id)
+
+    for target, items in jobs['move'].items():
+        job = JobWorker.submit('move', int(channel), {
+            'paths': [path_ for path_, _ in items], 'target': target})
+
+        for _, result in items:
+            result.update(status='queued', job=job.id)
+
+    if any(media.values()):
+        JobWorker.submit('media', int(channel), media)
+
+    return results
+
+
+JOB_HANDLERS = {
+    'media': process_media,
+    'delete': delete_files,
+    'move': transfer_files,
+    'copy': transfer_files,
+    'rename': rename_files
+}
+
+
+class JobWorker:
+    """
+    run queued jobs in background threads, every process has its own
+    workers, jobs are claimed with an atomic update, so they run only once.
+    Running jobs get a heartbeat, jobs from stopped workers are failed.
+    """
+    workers = None
+    executor = None
+    lock = Lock()
+    wake = Event()
+
+    @classmethod
+    def submit(cls, kind, channel, params):
+        """
+        add job to queue, workers start after the transaction is committed
+        """
+        Job.objects.filter(
+            status__in=['done', 'failed', 'cancelled'],
+            updated__lt=timezone.now() - timedelta(
+                seconds=settings.JOB_KEEP)).delete()
+
+        job = Job.objects.create(kind=kind, channel=channel,
+                                 params=json.dumps(params))
+        transaction.on_commit(cls.start)
+
+        return job
+
+    @classmethod
+    def start(cls):
+        with cls.lock:
+            if cls.workers is None or cls.workers[0] != os.getpid():
+                cls.workers = (os.getpid(), [
+                    Thread(target=cls.loop, daemon=True)
+                    for _ in range(settings.JOB_WORKERS)])
+
+                for worker in cls.workers[1]:
+                    worker.start()
+
+        cls.wake.set()
+
+    @classmethod
+    def loop(cls):
+        while True:
+            try:
+                while cls.run_next():
+                    pass
+            except DatabaseError:
+                # database is locked, try again later
+                pass
+            finally:
+                connection.close()
+
+            cls.wake.wait(settings.JOB_POLL_INTERVAL)
+            cls.wake.clear()
+
+    @classmethod
+    def call(cls, job, func, *args):
+        """
+        run blocking file operation in a real thread, with gevent workers
+        it would block the whole process otherwise,
+        the job heartbeat is written while waiting
+        """
+        with cls.lock:
+            if cls.executor is None or cls.executor[0] != os.getpid():
+                executor = GeventPoolExecutor if monkey and \
+                    monkey.is_module_patched('threading') \
+                    else ThreadPoolExecutor
+                cls.executor = (os.getpid(), executor(settings.JOB_WORKERS))
+
+        future = cls.executor[1].submit(func, *args)
+
+        while True:
+            try:
+                return future.result(settings.JOB_HEARTBEAT)
+            except FutureTimeout:
+                Job.objects.filter(id=job.id, status='running').update(
+                    updated=timezone.now())
+
+    @classmethod
+    def fail_stale(cls):
+        """
+        fail running jobs without heartbeat, their worker is gone
+        """
+        Job.objects.filter(
+            status='running', updated__lt=timezone.now() - timedelta(
+                seconds=settings.JOB_HEARTBEAT * 3)).update(
+            status='failed', result=json.dumps({'detail': 'Worker stopped'}),
+            updated=timezone.now())
+
+    @classmethod
+    def run_next(cls):
+        """
+        claim oldest queued job and run it, return False when queue is empty
+        """
+        cls.fail_stale()
+        job = Job.objects.filter(status='queued').order_by('created').first()
+
+        if not job:
+            return False
+
+        if not Job.objects.filter(id=job.id, status='queued').update(
+                status='running', updated=timezone.now()):
+            # claimed from other worker
+            return True
+
+        try:
+            result = JOB_HANDLERS[job.kind](job)
+            status = 'done'
+        except JobCancelled:
+            result = {'detail': 'Job was cancelled'}
+            status = 'cancelled'
+        except Exception as error:
+            result = {'detail': str(error)}
+            status = 'failed'
+
+        # job can be failed already, when heartbeat was missing
+        Job.objects.filter(id=job.id, status='running').update(
+            status=status, result=json.dumps(result), updated=timezone.now())
+
+        return True
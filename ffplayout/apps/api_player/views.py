@@ -1,22 +1,38 @@
 import os
-import shutil
+from datetime import datetime
 from time import sleep
 from urllib.parse import unquote
 
-from apps.api_player.models import GuiSettings, MessengePresets
+from apps.api_player.models import GuiSettings, Job, MessengePresets, Upload
 from apps.api_player.serializers import (GuiSettingsSerializer,
-                                         MessengerSerializer, UserSerializer)
+                                         JobSerializer, MessengerSerializer,
+                                         UserSerializer)
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.gzip import gzip_page
 from django_filters import rest_framework as filters
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.parsers import FileUploadParser, JSONParser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from .utils import (EngineControlSocket, SystemControl, SystemStats,
-                    get_media_path, read_json, read_log, read_yaml,
-                    send_message, write_json, write_yaml)
+from .live import event_stream, parse_channels
+
+from .utils import (EngineControlSocket, JobWorker, RangeFile,
+                    SystemControl, SystemStats, batch_file_operations,
+                    create_upload, export_playlists, generate_playlists,
+                    get_media_path, get_path, import_playlists,
+                    ndjson_playlists, parse_range, patch_playlist,
+                    playlist_entry, preset_to_drawtext, query_logs, read_log,
+                    read_yaml, remove_upload, search_media, send_message,
+                    send_messages, stream_media_path, validate_playlist,
+                    write_json, write_upload, write_yaml)
 
 
 class CurrentUserView(APIView):
@@ -86,6 +102,58 @@ class MessengerViewSet(viewsets.ModelViewSet):
     filterset_class = MessengerFilter
 
 
+class JobFilter(filters.FilterSet):
+
+    class Meta:
+        model = Job
+        fields = ['kind', 'channel', 'status']
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    status from background jobs
+    endpoint is: http://127.0.0.1:8000/api/player/jobs/<id>/
+    file operations are started with post:
+        {"channel": 1, "kind": "delete", "paths": ["/media/folder"]}
+        {"channel": 1, "kind": "move", "paths": [...], "target": "/media/x"}
+        {"channel": 1, "kind": "copy", "paths": [...], "target": "/media/x"}
+        {"channel": 1, "kind": "rename",
+         "renames": [["/media/clip.mp4", "new.mp4"]]}
+    running jobs are stopped with post to /api/player/jobs/<id>/cancel/
+    """
+    queryset = Job.objects.all().order_by('-created')
+    serializer_class = JobSerializer
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = JobFilter
+
+    def create(self, request, *args, **kwargs):
+        kind = request.data.get('kind')
+        params = {key: request.data[key] for key in ['paths', 'renames']
+                  if isinstance(request.data.get(key), list)}
+
+        if 'target' in request.data:
+            params['target'] = str(request.data['target'])
+
+        if kind not in ['delete', 'move', 'copy', 'rename'] or \
+                not read_yaml(request.data.get('channel')) or \
+                not (params.get('paths') or params.get('renames')):
+            return Response(status=400)
+
+        job = JobWorker.submit(kind, int(request.data['channel']), params)
+
+        return Response(self.get_serializer(job).data, status=202)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, *args, **kwargs):
+        job = self.get_object()
+        Job.objects.filter(id=job.id, status='queued').update(
+            status='cancelled')
+        Job.objects.filter(id=job.id).update(cancel=True)
+        job.refresh_from_db()
+
+        return Response(self.get_serializer(job).data)
+
+
 class MessageSender(APIView):
     """
     send messages with zmq to the playout engine
@@ -100,6 +168,32 @@ class MessageSender(APIView):
         return Response({"success": False})
 
 
+class MessageBatchSender(APIView):
+    """
+    send a message, or a message preset, to multiple channels
+    """
+
+    def post(self, request, *args, **kwargs):
+        if 'channels' in request.data:
+            if 'preset' in request.data:
+                preset = MessengePresets.objects.filter(
+                    id=request.data['preset']).first()
+
+                if not preset:
+                    return Response(status=404)
+
+                data = preset_to_drawtext(preset)
+            elif 'data' in request.data:
+                data = request.data['data']
+            else:
+                return Response({"success": False})
+
+            response = send_messages(data, request.data['channels'])
+            return Response({"success": True, 'status': response})
+
+        return Response({"success": False})
+
+
 class Config(APIView):
     """
     read and write config from ffplayout engine
@@ -152,17 +246,117 @@ class SystemCtl(APIView):
         return Response(status=404)
 
 
+class QueryTokenAuthentication(JWTAuthentication):
+    """
+    JWT authentication over token parameter,
+    for clients like EventSource or video elements, which can not set headers
+    """
+
+    def authenticate(self, request):
+        token = request.query_params.get('token')
+
+        if not token:
+            return None
+
+        validated_token = self.get_validated_token(token)
+
+        return self.get_user(validated_token), validated_token
+
+
+class LiveEvents(APIView):
+    """
+    server-sent events from statistics, engine status and new log lines
+    endpoint is: http://127.0.0.1:8000/api/player/live/?channels=1,2
+    """
+    authentication_classes = [QueryTokenAuthentication] + \
+        api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    def get(self, request, *args, **kwargs):
+        channels = parse_channels(request.GET.dict().get('channels', ''))
+
+        if channels is None:
+            return Response({'detail': 'Invalid channels'}, status=400)
+
+        response = StreamingHttpResponse(event_stream(channels),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+
+@method_decorator(gzip_page, name='dispatch')
 class LogReader(APIView):
+    """
+    read engine logs
+    optional parameters are: offset, for reading only new content,
+    or tail, for reading the last lines
+    """
+
     def get(self, request, *args, **kwargs):
         if 'type' in request.GET.dict() and 'date' in request.GET.dict():
             type_ = request.GET.dict()['type']
             date_ = request.GET.dict()['date']
             channel = request.GET.dict()['channel']
 
-            log = read_log(type_, date_, channel)
+            try:
+                offset = request.GET.dict().get('offset')
+                offset = max(int(offset), 0) if offset else None
+                tail = request.GET.dict().get('tail')
+                tail = max(int(tail), 0) if tail else None
+            except ValueError:
+                return Response(status=400)
+
+            log = read_log(type_, date_, channel, offset, tail)
 
             if log:
-                return Response({'log': log})
+                return Response(log)
+
+            return Response(status=204)
+
+        return Response(status=404)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class LogQuery(APIView):
+    """
+    search log records over multiple days
+    endpoint is: http://127.0.0.1:8000/api/player/log/query/?type=ffplayout
+    optional parameters are: from and to as date, level as list,
+    start and end as datetime, search and limit
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET.dict()
+
+        if 'type' in params and 'channel' in params:
+            today = datetime.now().strftime('%Y-%m-%d')
+
+            try:
+                date_from = datetime.strptime(params.get('from', today),
+                                              '%Y-%m-%d')
+                date_to = datetime.strptime(params.get('to', today),
+                                            '%Y-%m-%d')
+                start = datetime.fromisoformat(params['start']).timestamp() \
+                    if params.get('start') else None
+                end = datetime.fromisoformat(params['end']).timestamp() \
+                    if params.get('end') else None
+                limit = min(int(params.get('limit', 1000)), 10000)
+            except ValueError:
+                return Response(status=400)
+
+            if (date_to - date_from).days > settings.LOG_QUERY_DAYS:
+                return Response({'detail': 'Date range is to big'},
+                                status=400)
+
+            levels = params['level'].upper().split(',') \
+                if params.get('level') else None
+            records = query_logs(params['type'], params['channel'],
+                                 date_from, date_to, levels, start, end,
+                                 params.get('search'), limit)
+
+            if records is not None:
+                return Response({'records': records})
 
             return Response(status=204)
 
@@ -174,16 +368,26 @@ class Playlist(APIView):
     read and write config from ffplayout engine
     for reading endpoint:
         http://127.0.0.1:8000/api/player/playlist/?date=2020-04-12
+    responses have an ETag, unchanged playlists are answered with 304
+    with "validate": true, invalid playlists are not saved
     """
 
     def get(self, request, *args, **kwargs):
         if 'date' in request.GET.dict():
             date = request.GET.dict()['date']
             channel = request.GET.dict()['channel']
-            json_input = read_json(date, channel)
+            playlist = playlist_entry(date, channel)
+
+            if playlist and playlist['data']:
+                if playlist['etag'] in parse_etags(
+                        request.META.get('HTTP_IF_NONE_MATCH', '')):
+                    response = HttpResponse(status=304)
+                else:
+                    response = HttpResponse(playlist['content'],
+                                            content_type='application/json')
 
-            if json_input:
-                return Response(json_input)
+                response['ETag'] = playlist['etag']
+                return response
 
             return Response({
                 "success": False,
@@ -195,7 +399,8 @@ class Playlist(APIView):
         if 'data' in request.data:
             if 'channel' in request.data:
                 return write_json(request.data['data'],
-                                  request.data['channel'])
+                                  request.data['channel'],
+                                  bool(request.data.get('validate')))
             if 'delete' in request.data['data']:
                 if os.path.isfile(request.data['data']['delete']):
                     os.remove(request.data['data']['delete'])
@@ -204,6 +409,174 @@ class Playlist(APIView):
 
         return Response({'detail': 'Unspecified save error'}, status=400)
 
+    def patch(self, request, *args, **kwargs):
+        """
+        edit single program entries, with operations like:
+            [{"op": "move", "from": 3, "index": 0},
+             {"op": "replace", "index": 1, "value": {...}}]
+        send the ETag from reading in If-Match header,
+        to not overwrite changes from others
+        """
+        if 'date' in request.data and 'channel' in request.data and \
+                isinstance(request.data.get('operations'), list):
+            etags = parse_etags(request.META.get('HTTP_IF_MATCH', ''))
+
+            return patch_playlist(request.data['date'],
+                                  request.data['channel'],
+                                  request.data['operations'], etags)
+
+        return Response(status=400)
+
+
+class PlaylistGenerate(APIView):
+    """
+    fill playlists from date range with clips from media folders
+    endpoint is: http://127.0.0.1:8000/api/player/playlist/generate/
+    post {"channel": 1, "from": "2021-03-01", "to": "2021-03-31",
+          "folders": ["/media/Movies", "/media/Series"]}
+    optional are: mode=shuffle, length as hh:mm:ss, seed,
+    save=true for saving and overwrite=false for keeping existing playlists
+    """
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+
+        if 'channel' not in data or 'from' not in data or \
+                not isinstance(data.get('folders'), list):
+            return Response(status=400)
+
+        try:
+            date_from = datetime.strptime(data['from'], '%Y-%m-%d')
+            date_to = datetime.strptime(data.get('to', data['from']),
+                                        '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return Response(status=400)
+
+        if not 0 <= (date_to - date_from).days < settings.PLAYLIST_BULK_DAYS:
+            return Response({'detail': 'Date range is to big'}, status=400)
+
+        playlists = generate_playlists(
+            data['channel'], date_from, date_to, data['folders'],
+            data.get('mode', 'rotation'), data.get('length'),
+            data.get('seed'))
+
+        if playlists is None:
+            return Response({'detail': 'Channel not found'}, status=404)
+
+        if not playlists:
+            return Response({'detail': 'No clips found'}, status=400)
+
+        if data.get('save'):
+            return Response({'results': import_playlists(
+                playlists, data['channel'], data.get('overwrite', True))})
+
+        return Response({'playlists': playlists})
+
+
+class PlaylistValidate(APIView):
+    """
+    check sources, durations and length from playlist
+    for stored playlist, endpoint is:
+        http://127.0.0.1:8000/api/player/playlist/validate/?date=2020-04-12
+    for checking before saving, post {"channel": 1, "data": playlist}
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET.dict()
+
+        if 'date' in params and 'channel' in params:
+            config = read_yaml(params['channel'])
+            playlist = playlist_entry(params['date'], params['channel'])
+
+            if config and playlist:
+                return Response(validate_playlist(playlist['data'], config))
+
+            return Response(status=404)
+
+        return Response(status=400)
+
+    def post(self, request, *args, **kwargs):
+        if 'data' in request.data and 'channel' in request.data:
+            config = read_yaml(request.data['channel'])
+
+            if config:
+                return Response(validate_playlist(request.data['data'],
+                                                  config))
+
+            return Response(status=404)
+
+        return Response(status=400)
+
+
+class PlaylistBulk(APIView):
+    """
+    import and export playlists from many days
+    for export, endpoint is:
+        http://127.0.0.1:8000/api/player/playlist/bulk/?channel=1
+    with parameters from and to as date, optional output=tar
+    import takes {"channel": 1, "data": [...]},
+    or ndjson with channel as parameter
+    playlists over PLAYLIST_BULK_DAYS are not saved and get an error
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET.dict()
+
+        if 'channel' in params and 'from' in params:
+            try:
+                date_from = datetime.strptime(params['from'], '%Y-%m-%d')
+                date_to = datetime.strptime(params.get('to', params['from']),
+                                            '%Y-%m-%d')
+            except ValueError:
+                return Response(status=400)
+
+            if not 0 <= (date_to - date_from).days < \
+                    settings.PLAYLIST_BULK_DAYS:
+                return Response({'detail': 'Date range is to big'},
+                                status=400)
+
+            config = read_yaml(params['channel'])
+
+            if not config:
+                return Response({'detail': 'Channel not found'}, status=404)
+
+            if params.get('output') == 'tar':
+                response = StreamingHttpResponse(
+                    export_playlists(config, date_from, date_to, 'tar'),
+                    content_type='application/x-tar')
+                response['Content-Disposition'] = \
+                    f'attachment; filename="playlists-{params["from"]}.tar"'
+                return response
+
+            return StreamingHttpResponse(
+                export_playlists(config, date_from, date_to),
+                content_type='application/x-ndjson')
+
+        return Response(status=400)
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type.startswith('application/x-ndjson'):
+            channel = request.GET.dict().get('channel')
+            playlists = ndjson_playlists(
+                iter(request.stream.readline, b'')) \
+                if request.stream else []
+        else:
+            channel = request.data.get('channel') \
+                if isinstance(request.data, dict) else None
+            playlists = request.data.get('data') \
+                if isinstance(request.data, dict) else None
+
+        if not channel or playlists is None:
+            return Response(status=400)
+
+        results = import_playlists(
+            playlists, channel, limit=settings.PLAYLIST_BULK_DAYS)
+
+        if results is None:
+            return Response({'detail': 'Channel not found'}, status=404)
+
+        return Response({'results': results})
+
 
 class Statistics(APIView):
     """
@@ -212,33 +585,170 @@ class Statistics(APIView):
     """
 
     def get(self, request, *args, **kwargs):
+        name = request.GET.dict().get('stats')
+
+        if name not in SystemStats.names:
+            return Response(status=404)
+
         stats = SystemStats()
-        if 'stats' in request.GET.dict() and request.GET.dict()['stats'] \
-                and hasattr(stats, request.GET.dict()['stats']):
-            return Response(
-                getattr(stats, request.GET.dict()['stats'])())
 
-        return Response(status=404)
+        if stats.sample is None:
+            # sampler has no values yet
+            return Response(status=503)
+
+        return Response(getattr(stats, name)())
+
+
+class StatisticsHistory(APIView):
+    """
+    get history from system statistics
+    for reading, endpoint is:
+        http://127.0.0.1:8000/api/player/stats/history/?resolution=minute
+    optional parameters are: start and end as unix time, and fields
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET.dict()
+
+        try:
+            start = float(params['start']) if params.get('start') else None
+            end = float(params['end']) if params.get('end') else None
+        except ValueError:
+            return Response(status=400)
+
+        fields = params['fields'].split(',') if params.get('fields') \
+            else None
+        history = SystemStats().history(
+            params.get('resolution', 'second'), start, end, fields)
+
+        if history:
+            return Response(history)
+
+        return Response(status=400)
 
 
 class Media(APIView):
     """
     get folder/files tree, for building a file explorer
     for reading, endpoint is: http://127.0.0.1:8000/api/player/media/?path
+    optional parameters are: offset, limit and stream=1 for ndjson output
     """
 
     def get(self, request, *args, **kwargs):
         if 'extensions' in request.GET.dict():
             extensions = request.GET.dict()['extensions']
             channel = request.GET.dict()['channel']
+            path_ = request.GET.dict().get('path', '')
+
+            if 'path' not in request.GET.dict():
+                return Response(status=204)
+
+            try:
+                offset = max(int(request.GET.dict().get('offset', 0)), 0)
+                limit = request.GET.dict().get('limit')
+                limit = int(limit) if limit else None
+            except ValueError:
+                return Response(status=400)
+
+            if limit is not None and limit < 1:
+                # empty pages would never reach the end
+                return Response(status=400)
+
+            if request.GET.dict().get('stream'):
+                return StreamingHttpResponse(
+                    stream_media_path(extensions, channel, path_,
+                                      offset, limit),
+                    content_type='application/x-ndjson')
+
+            return Response(get_media_path(extensions, channel, path_,
+                                           offset, limit))
+
+        return Response(status=404)
+
 
-            if 'path' in request.GET.dict() and request.GET.dict()['path']:
-                return Response({'tree': get_media_path(
-                    extensions, channel, request.GET.dict()['path']
-                )})
+class MediaStream(APIView):
+    """
+    serve media file for preview, with support for range requests
+    endpoint is:
+        http://127.0.0.1:8000/api/player/media/stream/?path=/media/clip.mp4
+    """
+    authentication_classes = [QueryTokenAuthentication] + \
+        api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET.dict()
+        config = read_yaml(params.get('channel'))
+
+        if not config or not params.get('path'):
+            return Response(status=404)
+
+        root = os.path.realpath(config['storage']['path'])
+        _, path_ = get_path(unquote(params['path']), root)
+        path_ = os.path.realpath(path_)
 
-            if 'path' in request.GET.dict():
-                return Response({'tree': get_media_path(extensions, channel)})
+        if not path_.startswith(root + os.sep) or not os.path.isfile(path_):
+            return Response(status=404)
+
+        stat = os.stat(path_)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = http_date(stat.st_mtime)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        byte_range = parse_range(request.META.get('HTTP_RANGE'),
+                                 stat.st_size)
+
+        if if_range and if_range not in [etag, last_modified]:
+            # file was changed, send it complete
+            byte_range = None
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        start, end = byte_range or (0, stat.st_size - 1)
+        response = FileResponse(
+            RangeFile(path_, start, end - start + 1),
+            filename=os.path.basename(path_),
+            status=206 if byte_range else 200)
+        # no file name in range file, set length from range
+        response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response.block_size = 65536
+
+        if byte_range:
+            response['Content-Range'] = \
+                f'bytes {start}-{end}/{stat.st_size}'
+
+        return response
+
+
+class MediaSearch(APIView):
+    """
+    search files in whole media storage
+    for reading, endpoint is:
+        http://127.0.0.1:8000/api/player/media/search/?channel=1&q=clip
+    optional parameters are: mode=prefix, extensions and limit
+    """
+
+    def get(self, request, *args, **kwargs):
+        if 'q' in request.GET.dict() and 'channel' in request.GET.dict():
+            params = request.GET.dict()
+            extensions = params['extensions'].split(',') \
+                if params.get('extensions') else None
+
+            try:
+                limit = min(int(params.get('limit', 100)), 1000)
+            except ValueError:
+                return Response(status=400)
+
+            results = search_media(params['q'], params['channel'],
+                                   params.get('mode', 'substring'),
+                                   extensions, limit)
+
+            if results is not None:
+                return Response({'results': results})
 
             return Response(status=204)
 
@@ -255,12 +765,131 @@ class FileUpload(APIView):
         filename = unquote(filename)
         path = unquote(request.query_params['path']).split('/')[1:]
 
-        with open(os.path.join(root, *path, filename), 'wb') as outfile:
+        file_path = os.path.join(root, *path, filename)
+
+        with open(file_path, 'wb') as outfile:
             for chunk in file_obj.chunks():
                 outfile.write(chunk)
+
+        job = JobWorker.submit('media', int(request.query_params['channel']),
+                               {'paths': [file_path]})
+
+        return Response({'job': job.id})
+
+
+class ResumableUpload(APIView):
+    """
+    resumable upload, in chunks:
+        - create with post {"channel": 1, "path": "/media/folder",
+          "filename": "clip.mp4", "size": 1024, "checksum": "<sha256>"}
+          to http://127.0.0.1:8000/api/player/media/upload/
+        - send data with patch to the returned location,
+          Upload-Offset header must match the stored offset
+        - head returns the stored offset, for resuming
+    """
+
+    def upload_response(self, upload, status=204):
+        response = Response(status=status)
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.size
+        response['Cache-Control'] = 'no-store'
+
+        return response
+
+    def post(self, request, *args, **kwargs):
+        try:
+            size = int(request.data['size'])
+
+            if size < 0:
+                raise ValueError('negative size')
+
+            upload = create_upload(
+                int(request.data['channel']), request.data['path'],
+                request.data['filename'], size,
+                request.data.get('checksum', ''))
+        except (KeyError, TypeError, ValueError):
+            return Response(status=400)
+
+        if not upload:
+            return Response(status=404)
+
+        response = self.upload_response(upload, 201)
+        response['Location'] = f'{request.path}{upload.id}/'
+        response.data = {'id': upload.id, 'offset': upload.offset}
+
+        return response
+
+    def head(self, request, upload_id, *args, **kwargs):
+        upload = Upload.objects.filter(id=upload_id).first()
+
+        if not upload:
+            return Response(status=404)
+
+        return self.upload_response(upload)
+
+    def patch(self, request, upload_id, *args, **kwargs):
+        upload = Upload.objects.filter(id=upload_id).first()
+
+        if not upload:
+            return Response(status=404)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+        except (KeyError, ValueError):
+            return Response(status=400)
+
+        status = write_upload(upload, request.stream, offset)
+
+        if status == 460:
+            return Response({'detail': 'Checksum mismatch'}, status=460)
+
+        response = self.upload_response(upload, status)
+
+        if status == 204 and upload.offset == upload.size:
+            job = JobWorker.submit('media', upload.channel,
+                                   {'paths': [upload.path]})
+            response.status_code = 200
+            response.data = {'job': job.id}
+
+        return response
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        upload = Upload.objects.filter(id=upload_id).first()
+
+        if not upload:
+            return Response(status=404)
+
+        remove_upload(upload)
+
         return Response(status=204)
 
 
+class FileBatchOperations(APIView):
+    """
+    run many file operations in one request
+    endpoint is: http://127.0.0.1:8000/api/player/media/op/batch/
+    post {"channel": 1, "operations": [
+        {"op": "delete", "path": "/media/clip.mp4"},
+        {"op": "move", "path": "/media/clip.mp4", "target": "/media/x"},
+        {"op": "rename", "path": "/media/clip.mp4", "name": "new.mp4"},
+        {"op": "mkdir", "path": "/media", "name": "folder"}]}
+    folders are deleted in a background job
+    """
+
+    def post(self, request, *args, **kwargs):
+        if 'channel' in request.data and \
+                isinstance(request.data.get('operations'), list):
+            results = batch_file_operations(request.data['channel'],
+                                            request.data['operations'])
+
+            if results is None:
+                return Response({'detail': 'Channel not found'}, status=404)
+
+            return Response({'results': results})
+
+        return Response(status=400)
+
+
 class FileOperations(APIView):
 
     def delete(self, request, *args, **kwargs):
@@ -274,14 +903,19 @@ class FileOperations(APIView):
 
             if not _file or _file == 'null':
                 if os.path.isdir(full_path):
-                    shutil.rmtree(full_path, ignore_errors=True)
-                    return Response(status=200)
+                    job = JobWorker.submit(
+                        'delete', int(channel),
+                        {'paths': [unquote(request.GET.dict()['path'])]})
+                    return Response({'job': job.id}, status=202)
 
                 return Response(status=404)
 
             if os.path.isfile(os.path.join(full_path, _file)):
                 os.remove(os.path.join(full_path, _file))
-                return Response(status=200)
+                job = JobWorker.submit(
+                    'media', int(channel),
+                    {'paths': [os.path.join(full_path, _file)]})
+                return Response({'job': job.id}, status=200)
 
             return Response(status=404)
 
@@ -298,7 +932,9 @@ class FileOperations(APIView):
 
             try:
                 os.mkdir(full_path)
-                return Response(status=200)
+                job = JobWorker.submit('media', int(channel),
+                                       {'scan': [full_path]})
+                return Response({'job': job.id}, status=200)
             except OSError:
                 Response(status=500)
 
@@ -317,7 +953,9 @@ class FileOperations(APIView):
             new_file = os.path.join(root, path_, new_name)
 
             os.rename(old_file, new_file)
+            job = JobWorker.submit('media', int(channel),
+                                   {'moved': [[old_file, new_file]]})
 
-            return Response(status=200)
+            return Response({'job': job.id}, status=200)
 
         return Response(status=204)
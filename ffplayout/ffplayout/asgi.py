@@ -14,4 +14,31 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault(
     'DJANGO_SETTINGS_MODULE', 'ffplayout.settings.development')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# live events, statistics and jobs need a loaded django
+# pylint: disable=wrong-import-position
+from apps.api_player.live import LIVE_PATH, live_application  # noqa: E402
+from apps.api_player.utils import (  # noqa: E402
+    JobWorker, start_stats_sampler)
+
+start_stats_sampler()
+# pick up queued jobs and fail jobs from stopped workers
+JobWorker.start()
+
+
+async def application(scope, receive, send):
+    """
+    live events are served directly, everything else goes to django
+    """
+    if scope['type'] in ['http', 'websocket'] and \
+            scope['path'] == LIVE_PATH:
+        return await live_application(scope, receive, send)
+
+    if scope['type'] == 'websocket':
+        # live events are the only websocket, reject all other paths
+        await receive()
+        await send({'type': 'websocket.close'})
+        return None
+
+    return await django_application(scope, receive, send)
@@ -141,8 +141,76 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 # ffmpeg filter node, needs to be edit only when the filter chain changes
 DRAW_TEXT_NODE = 'Parsed_drawtext_2'
 
+# seconds to cache gui settings, changes from other workers
+# are visible after this time
+CONFIG_CACHE_TTL = 10
+
+# system statistics, are collected in background every STATS_INTERVAL
+# seconds, the last STATS_BUFFER_SIZE samples are kept in memory
+STATS_INTERVAL = 1
+STATS_BUFFER_SIZE = 60
+# history from statistics, per sample for the last STATS_HISTORY_SECONDS
+# and per minute average for the last STATS_HISTORY_MINUTES
+STATS_HISTORY_SECONDS = 3600
+STATS_HISTORY_MINUTES = 1440
+# folder for the history files, which are shared between processes
+STATS_HISTORY_DIR = os.path.join(BASE_DIR, 'dbs')
+
+# number of playlists, which are cached in memory
+PLAYLIST_CACHE_SIZE = 64
+# save playlists without indentation and spaces
+PLAYLIST_COMPACT = False
+# maximal days for playlist import and export in one request
+PLAYLIST_BULK_DAYS = 92
+# allowed difference in seconds, between declared and real clip duration
+PLAYLIST_DURATION_TOLERANCE = 1
+
+# maximal bytes from log, which are read by one incremental request
+LOG_CHUNK_SIZE = 1048576
+# number of log files, from which the record index is kept in memory
+LOG_INDEX_FILES = 32
+# maximal days, which can be searched at once
+LOG_QUERY_DAYS = 31
+
+# live events: seconds between updates, maximal queued events per client
+# and which engine log is send
+LIVE_INTERVAL = 2
+LIVE_QUEUE_SIZE = 100
+LIVE_LOG_TYPE = 'ffplayout'
+
 # zmq settings
 REQUEST_TIMEOUT = 1000
+# idle connections to keep open, per engine
+ZMQ_POOL_SIZE = 4
+
+# media cache settings
+# maximal number of clips, from which the duration is cached
+MEDIA_CACHE_SIZE = 100000
+# parallel parsing of uncached clips
+MEDIA_PROBE_WORKERS = 4
+# seconds to wait for a single clip, before it gets skipped
+MEDIA_PROBE_TIMEOUT = 10
+
+# index the media storage in background, updates come from inotify
+MEDIA_INDEX = True
+# seconds between full rescans from the media storage
+MEDIA_INDEX_RESCAN = 3600
+# seconds between tries to take over indexing, from a stopped process
+MEDIA_INDEX_LOCK_RETRY = 5
+
+# resumable uploads: bytes per write, seconds until unfinished uploads
+# are removed
+UPLOAD_CHUNK_SIZE = 1048576
+UPLOAD_EXPIRE = 86400
+
+# background jobs: worker threads per process, seconds between polling
+# for jobs from other processes and seconds to keep finished jobs
+JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 5
+JOB_KEEP = 604800
+# seconds between heartbeats from running jobs, jobs without heartbeat
+# for three times this value are failed
+JOB_HEARTBEAT = 10
 
 ###############################################################################
 # controlling of the engine over supervisord xmlrpclib
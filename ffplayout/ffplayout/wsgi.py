@@ -15,3 +15,12 @@ os.environ.setdefault(
     'DJANGO_SETTINGS_MODULE', 'ffplayout.settings.development')
 
 application = get_wsgi_application()
+
+# statistics and jobs need a loaded django
+# pylint: disable=wrong-import-position
+from apps.api_player.utils import (  # noqa: E402
+    JobWorker, start_stats_sampler)
+
+start_stats_sampler()
+# pick up queued jobs and fail jobs from stopped workers
+JobWorker.start()